@@ -2,9 +2,9 @@
 
 import os
 from pathlib import Path
-from pydantic import field_validator
+from pydantic import Field
 from pydantic_settings import BaseSettings
-from functools import lru_cache
+from functools import cached_property, lru_cache
 
 
 # Project paths
@@ -12,6 +12,11 @@ PROJECT_ROOT = Path(__file__).parent.parent
 MODELS_DIR = PROJECT_ROOT / "models"
 
 
+def _hf_token_from_env() -> str:
+    """HF token fallback when NAME_DETECTOR_HF_TOKEN is not set"""
+    return os.getenv("HF_TOKEN", "")
+
+
 class Settings(BaseSettings):
     """Application settings"""
 
@@ -23,9 +28,24 @@ class Settings(BaseSettings):
 
     # NER Engine (Tier 2)
     spacy_model: str = "uk_core_news_md"
+    ner_use_gpu: bool = False  # spacy.prefer_gpu() — потрібен spacy[cuda12x] + CUDA toolkit
     ner_confidence_threshold: float = 0.7
     llm_verification_threshold: float = 0.85  # Использовать LLM для проверки если confidence < этого значения
 
+    # RoBERTa NER (Tier 2b): INT8 dynamic quantization Linear-шарів (лише CPU з AVX-512 VNNI)
+    roberta_quantize: bool = True
+    roberta_bf16_compile: bool = False  # bf16 + torch.compile замість INT8 (CUDA або CPU з AVX-512 BF16/AMX)
+    roberta_onnx: bool = False  # ONNX Runtime INT8 замість PyTorch (pip install optimum[onnxruntime])
+    roberta_skip_threshold: float = 0.9  # Не запускати RoBERTa, якщо spaCy дав FULL_NAME з confidence >= цього
+    roberta_batch_size: int = 1  # >1 — мікробатчинг: одночасні запити в одному проході моделі
+    roberta_batch_wait_ms: int = 10  # Вікно накопичення батчу
+    roberta_cache_maxsize: int = 4096  # LRU результатів RoBERTa за текстом (вимикається разом з cache_enabled)
+    roberta_torch_threads: int = 4  # intra-op потоки torch (>4 для base-моделі не швидше); 0 = default torch. При --workers N: ~ядра/N
+
+    # Мікробатчинг запитів API: >1 — одночасні запити збираються в батч (spaCy nlp.pipe)
+    pipeline_batch_size: int = 1
+    pipeline_batch_timeout_ms: int = 5  # Скільки чекати на добір батчу
+
     # LLM Fallback (Tier 3) - llama.cpp з MamayLM (легкий для слабых машин)
     # Для Apple Silicon рекомендуется использовать Ollama
     llm_enabled: bool = True
@@ -37,38 +57,50 @@ class Settings(BaseSettings):
     llm_model_repo: str = "INSAIT-Institute/MamayLM-Gemma-3-4B-IT-v1.0-GGUF"
     llm_model_file: str = "MamayLM-Gemma-3-4B-IT-v1.0.Q4_K_M.gguf"
     llm_model_size_mb: int = 2500  # ~2.5GB
+    # verify_setup: повне завантаження Llama (секунди на кожен старт); False — перевірка заголовка GGUF і розміру
+    llm_verify_load: bool = False
 
     # Ollama settings (if using ollama backend)
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "mamaylm:latest"  # Используйте модель MamayLM через Ollama
+    ollama_keep_alive: str = "30m"  # Тримати модель завантаженою (кеш промпту між запитами)
 
     # HuggingFace token (з .env: NAME_DETECTOR_HF_TOKEN або HF_TOKEN) — не комітити в репо!
-    hf_token: str = ""
-
-    @field_validator("hf_token", mode="before")
-    @classmethod
-    def _hf_token_from_env(cls, v: str) -> str:
-        return v or os.getenv("HF_TOKEN", "") or os.getenv("NAME_DETECTOR_HF_TOKEN", "")
+    # NAME_DETECTOR_HF_TOKEN читає сам pydantic-settings; HF_TOKEN — лише як default
+    hf_token: str = Field(default_factory=_hf_token_from_env)
 
     # LLM параметри (оптимізовані для слабких машин)
     llm_context_length: int = 2048
-    llm_threads: int = 1  # 1 = стабільніше на Apple Silicon (llama.cpp)
-    llm_max_tokens: int = 150
-    llm_temperature: float = 0.1
+    llm_threads: int = 1  # 1 = стабільніше на Apple Silicon (llama.cpp); 0 = авто (min(16, CPU))
+    llm_n_batch: int = 2048  # Логічний batch для prefill (llama.cpp обрізає до n_ctx)
+    llm_n_ubatch: int = 512  # Фізичний micro-batch
+    llm_n_gpu_layers: int = 0  # Шарів на GPU (Metal/CUDA), 0 = лише CPU
+    llm_max_tokens: int = 32  # Відповідь — категорія + до 3 слів (~20 токенів)
+    llm_temperature: float = 0.0  # Greedy, детерміновано
     llm_timeout: int = 30  # Менший таймаут для швидшої відповіді
     llm_max_concurrent: int = 2  # Менше одночасних запитів
 
+    # Лог запитів: "csv" (logs/requests.csv) або "ndjson" (logs/requests.ndjson, швидше)
+    request_log_format: str = "csv"
+
     # Cache
     cache_enabled: bool = True
     cache_maxsize: int = 10000
 
     @property
+    def llm_threads_resolved(self) -> int:
+        """llm_threads, with 0 meaning auto-detect"""
+        return self.llm_threads or min(16, os.cpu_count() or 8)
+
+    @cached_property
     def llm_model_path(self) -> Path:
+        # Settings frozen — шлях обчислюємо один раз
         return MODELS_DIR / self.llm_model_name
 
     class Config:
         env_file = ".env"
         env_prefix = "NAME_DETECTOR_"
+        frozen = True
 
 
 @lru_cache
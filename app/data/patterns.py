@@ -1,59 +1,77 @@
 """Regex patterns for quick filtering of payment comments"""
 
 import re
-from typing import List, Pattern
+import threading
+from typing import List, Optional, Pattern, Tuple
+
+try:
+    # google-re2: DFA-based engine, matching time doesn't depend on branch count
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    # Hyperscan: all patterns in one SIMD-scanned database
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Month names (Ukrainian + Russian) - merged into one "за <місяць>" pattern
+MONTHS: List[str] = [
+    'січень', 'лютий', 'березень', 'квітень', 'травень', 'червень',
+    'липень', 'серпень', 'вересень', 'жовтень', 'листопад', 'грудень',
+    'январь', 'февраль', 'март', 'апрель', 'май', 'июнь',
+    'июль', 'август', 'сентябрь', 'октябрь', 'ноябрь', 'декабрь',
+]
 
 # Patterns that indicate NO NAME is present (case-insensitive)
 NO_NAME_PATTERNS_RAW: List[str] = [
     # Salary and payments
-    r'^(зарплата|зп|з/п|заробітна плата)(\s|$|\.)',
-    r'^(аванс|премія|премия|виплата|выплата)(\s|$|\.)',
-    r'^(відпускні|отпускные|лікарняні|больничные)(\s|$|\.)',
-    r'^(компенсація|компенсация|допомога|помощь)(\s|$|\.)',
+    r'^(?:зарплата|зп|з/п|заробітна плата)(?:\s|$|\.)',
+    r'^(?:аванс|премія|премия|виплата|выплата)(?:\s|$|\.)',
+    r'^(?:відпускні|отпускные|лікарняні|больничные)(?:\s|$|\.)',
+    r'^(?:компенсація|компенсация|допомога|помощь)(?:\s|$|\.)',
 
     # Taxes and fees
-    r'^(податки|податок|налоги|налог)(\s|$|\.)',
-    r'^(єсв|ндфл|пдв|ндс|єдиний внесок)(\s|$|\.)',
-    r'^(військовий збір|военный сбор)(\s|$|\.)',
+    r'^(?:податки|податок|налоги|налог)(?:\s|$|\.)',
+    r'^(?:єсв|ндфл|пдв|ндс|єдиний внесок)(?:\s|$|\.)',
+    r'^(?:військовий збір|военный сбор)(?:\s|$|\.)',
 
     # Transfers without names
-    r'^(поповнення|пополнение)(\s|$|\.)',
-    r'^(переказ коштів|перевод средств)$',
-    r'^(переказ|перевод)$',
-    r'^(оплата послуг|оплата услуг)(\s|$|\.)',
-    r'^(комунальні|коммунальные)(\s|$|\.)',
+    r'^(?:поповнення|пополнение)(?:\s|$|\.)',
+    r'^(?:переказ коштів|перевод средств)$',
+    r'^(?:переказ|перевод)$',
+    r'^(?:оплата послуг|оплата услуг)(?:\s|$|\.)',
+    r'^(?:комунальні|коммунальные)(?:\s|$|\.)',
 
     # Numbers only
-    r'^\d+[\s\.]*(грн|uah|₴|usd|\$|eur|€)?$',
+    r'^\d+[\s\.]*(?:грн|uah|₴|usd|\$|eur|€)?$',
     r'^[\d\s\.,]+$',
 
     # Common non-name phrases
-    r'^(рахунок|счет|invoice|інвойс)(\s|#|№|\d)',
-    r'^(замовлення|заказ|order)(\s|#|№|\d)',
-    r'^(договір|договор|contract)(\s|#|№|\d)',
-    r'^(акт|рахунок-фактура)(\s|#|№|\d)',
+    r'^(?:рахунок|счет|invoice|інвойс)(?:\s|#|№|\d)',
+    r'^(?:замовлення|заказ|order)(?:\s|#|№|\d)',
+    r'^(?:договір|договор|contract)(?:\s|#|№|\d)',
+    r'^(?:акт|рахунок-фактура)(?:\s|#|№|\d)',
 
     # Service payments
-    r'^(за (послуги|товари|роботи|services))(\s|$|\.)',
-    r'^(оренда|аренда|rent)(\s|$|\.)',
-    r'^(кредит|позика|займ|loan)(\s|$|\.)',
-    r'^(повернення|возврат|refund)(\s|$|\.)',
+    r'^(?:за (?:послуги|товари|роботи|services))(?:\s|$|\.)',
+    r'^(?:оренда|аренда|rent)(?:\s|$|\.)',
+    r'^(?:кредит|позика|займ|loan)(?:\s|$|\.)',
+    r'^(?:повернення|возврат|refund)(?:\s|$|\.)',
 
     # Utilities
-    r'^(електроенергія|электроэнергия|gas|газ|вода|water)(\s|$|\.)',
-    r'^(інтернет|internet|телефон|phone)(\s|$|\.)',
+    r'^(?:електроенергія|электроэнергия|gas|газ|вода|water)(?:\s|$|\.)',
+    r'^(?:інтернет|internet|телефон|phone)(?:\s|$|\.)',
 
     # Business terms
-    r'^(прибуток|прибыль|дохід|доход)(\s|$|\.)',
-    r'^(витрати|расходы|costs)(\s|$|\.)',
-    r'^(бюджет|budget)(\s|$|\.)',
+    r'^(?:прибуток|прибыль|дохід|доход)(?:\s|$|\.)',
+    r'^(?:витрати|расходы|costs)(?:\s|$|\.)',
+    r'^(?:бюджет|budget)(?:\s|$|\.)',
 
     # Period markers (without names)
-    r'^за\s+(січень|лютий|березень|квітень|травень|червень)',
-    r'^за\s+(липень|серпень|вересень|жовтень|листопад|грудень)',
-    r'^за\s+(январь|февраль|март|апрель|май|июнь)',
-    r'^за\s+(июль|август|сентябрь|октябрь|ноябрь|декабрь)',
-    r'^за\s+\d+\s*(місяць|месяц|квартал|рік|год)',
+    rf'^за\s+(?:{"|".join(MONTHS)})',
+    r'^за\s+\d+\s*(?:місяць|месяц|квартал|рік|год)',
     r'^за\s+\d{1,2}[\./]\d{2,4}',
 
     # Привітання та гасла (не ПІБ)
@@ -65,18 +83,22 @@ NO_NAME_PATTERNS_RAW: List[str] = [
     r'^з 8 березня$',
 ]
 
+# Cyrillic building blocks for name patterns (один клас символів на всі паттерни)
+UPPER = r'[А-ЯІЇЄҐ]'
+LOWER = r'[а-яіїєґ]+'
+WORD = rf'{UPPER}{LOWER}'
+
 # Patterns that indicate a name IS LIKELY present
 NAME_INDICATOR_PATTERNS_RAW: List[str] = [
     # Transfer to person
-    r'(переказ|перевод|на карту|на картку)\s+[А-ЯІЇЄҐА-яіїєґ]+',
-    r'(від|от|from)\s+[А-ЯІЇЄҐ][а-яіїєґ]+',
-    r'(для|кому|to)\s+[А-ЯІЇЄҐ][а-яіїєґ]+',
+    r'(?:переказ|перевод|на карту|на картку)\s+[А-ЯІЇЄҐА-яіїєґ]+',
+    rf'(?:від|от|from)\s+{WORD}',
+    rf'(?:для|кому|to)\s+{WORD}',
 
     # Name patterns (Cyrillic)
-    r'[А-ЯІЇЄҐ][а-яіїєґ]+\s+[А-ЯІЇЄҐ][а-яіїєґ]+\s+[А-ЯІЇЄҐ][а-яіїєґ]+ович',
-    r'[А-ЯІЇЄҐ][а-яіїєґ]+\s+[А-ЯІЇЄҐ][а-яіїєґ]+\s+[А-ЯІЇЄҐ][а-яіїєґ]+івна',
-    r'[А-ЯІЇЄҐ][а-яіїєґ]+\s+[А-ЯІЇЄҐ][а-яіїєґ]+\s+[А-ЯІЇЄҐ][а-яіїєґ]+овна',
-    r'[А-ЯІЇЄҐ][а-яіїєґ]+\s+[А-ЯІЇЄҐ]\.\s*[А-ЯІЇЄҐ]\.',  # Іванов І.І.
+    # Прізвище Ім'я По-батькові — один паттерн, суфікси в альтернації
+    rf'{WORD}\s+{WORD}\s+{WORD}(?:ович|івна|овна)',
+    rf'{WORD}\s+{UPPER}\.\s*{UPPER}\.',  # Іванов І.І.
 ]
 
 
@@ -85,24 +107,227 @@ def compile_patterns(patterns: List[str]) -> List[Pattern]:
     return [re.compile(p, re.IGNORECASE | re.UNICODE) for p in patterns]
 
 
-# Compiled patterns for fast matching
+def compile_combined(patterns: List[str]) -> Pattern:
+    """
+    Compile patterns into a single alternation (one search instead of N).
+
+    Uses RE2 when available, falls back to stdlib re otherwise.
+    """
+    combined = "|".join(f"(?:{p})" for p in patterns)
+    if re2 is not None:
+        try:
+            # RE2 не приймає прапорці re.* — регістр задаємо inline
+            return re2.compile(f"(?i){combined}")
+        except Exception:
+            pass
+    return re.compile(combined, re.IGNORECASE | re.UNICODE)
+
+
+def compile_hyperscan(patterns: List[str]) -> Optional["hyperscan.Database"]:
+    """Compile patterns into a Hyperscan block-mode database (None if unavailable)"""
+    if hyperscan is None:
+        return None
+    flags = (
+        hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8 |
+        hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_SINGLEMATCH
+    )
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[p.encode("utf-8") for p in patterns],
+            ids=list(range(len(patterns))),
+            flags=[flags] * len(patterns)
+        )
+        return db
+    except Exception:
+        return None
+
+
+_REGEX_META = set("\\.^$*+?{}[]()|")
+
+
+def _split_alternatives(body: str) -> List[str]:
+    """Split group body on top-level '|'"""
+    alts, depth, current, i = [], 0, [], 0
+    while i < len(body):
+        ch = body[i]
+        if ch == "\\":
+            current.append(body[i:i + 2])
+            i += 2
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            alts.append("".join(current))
+            current = []
+            i += 1
+            continue
+        current.append(ch)
+        i += 1
+    alts.append("".join(current))
+    return alts
+
+
+def _literal_prefixes(pattern: str) -> Optional[List[str]]:
+    """
+    Extract the literal prefixes a pattern must start with.
+
+    Returns None if any branch starts with a non-literal (e.g. \\d, [..]).
+    """
+    if pattern.startswith("("):
+        depth = 0
+        for end, ch in enumerate(pattern):
+            if ch == "(" and (end == 0 or pattern[end - 1] != "\\"):
+                depth += 1
+            elif ch == ")" and pattern[end - 1] != "\\":
+                depth -= 1
+                if depth == 0:
+                    break
+        body = pattern[1:end]
+        if body.startswith("?:"):
+            body = body[2:]
+        prefixes = []
+        for alt in _split_alternatives(body):
+            alt_prefixes = _literal_prefixes(alt)
+            if alt_prefixes is None:
+                return None
+            prefixes.extend(alt_prefixes)
+        return prefixes
+
+    literal = []
+    for i, ch in enumerate(pattern):
+        if ch in _REGEX_META:
+            # Квантифікатор робить попередній символ необов'язковим
+            if ch in "*?{" and literal:
+                literal.pop()
+            break
+        literal.append(ch)
+    prefix = "".join(literal).lower()
+    return [prefix] if prefix else None
+
+
+def build_prefix_screen(patterns: List[str]) -> Tuple[Tuple[str, ...], List[str]]:
+    """
+    Split ^-anchored patterns into literal prefixes for a str.startswith
+    prescreen, and the patterns that have no literal prefix.
+    """
+    prefixes: List[str] = []
+    unprefixed: List[str] = []
+    for p in patterns:
+        p_prefixes = _literal_prefixes(p[1:]) if p.startswith("^") else None
+        if p_prefixes is None:
+            unprefixed.append(p)
+        else:
+            prefixes.extend(p_prefixes)
+    return tuple(sorted(set(prefixes))), unprefixed
+
+
+def split_exact_literals(patterns: List[str]) -> Tuple[frozenset, List[str]]:
+    """
+    Pull out patterns of the form ^literal$ / ^(?:lit1|lit2)$ as a set of
+    exact strings (hash lookup instead of regex); return the rest unchanged.
+    """
+    exact = set()
+    rest: List[str] = []
+    for p in patterns:
+        body = p[1:-1] if p.startswith("^") and p.endswith("$") else None
+        if body and body.startswith("(?:") and body.endswith(")"):
+            body = body[3:-1]
+        alts = _split_alternatives(body) if body else []
+        if alts and all(a and not (set(a) & _REGEX_META) for a in alts):
+            exact.update(a.lower() for a in alts)
+        else:
+            rest.append(p)
+    return frozenset(exact), rest
+
+
+# Hyperscan scratch не можна ділити між потоками — по одному на потік
+_hs_local = threading.local()
+
+
+def _hyperscan_matches(db: "hyperscan.Database", text: str) -> bool:
+    """Scan text with Hyperscan, stopping at the first match"""
+    scratch = getattr(_hs_local, "scratch", None)
+    if scratch is None:
+        scratch = _hs_local.scratch = hyperscan.Scratch(db)
+
+    found = []
+
+    def on_match(pattern_id, start, end, flags, context):
+        found.append(pattern_id)
+        return True  # terminate scan
+
+    try:
+        db.scan(text.encode("utf-8"), match_event_handler=on_match, scratch=scratch)
+    except hyperscan.ScanTerminated:
+        pass
+    return bool(found)
+
+
+# Compiled patterns for fast matching (individual lists kept for debugging)
 NO_NAME_PATTERNS: List[Pattern] = compile_patterns(NO_NAME_PATTERNS_RAW)
 NAME_INDICATOR_PATTERNS: List[Pattern] = compile_patterns(NAME_INDICATOR_PATTERNS_RAW)
 
+# Точні фрази (привітання, "переказ коштів") — перевіряються через frozenset
+EXACT_NO_NAME, _NO_NAME_REGEX_RAW = split_exact_literals(NO_NAME_PATTERNS_RAW)
+
+# ^-заякорені паттерни матчимо через .match (лише позиція 0), без самого ^
+_NO_NAME_ANCHORED_RAW = [p for p in _NO_NAME_REGEX_RAW if p.startswith("^")]
+_NO_NAME_UNANCHORED_RAW = [p for p in _NO_NAME_REGEX_RAW if not p.startswith("^")]
+
+NO_NAME_COMBINED: Pattern = compile_combined([p[1:] for p in _NO_NAME_ANCHORED_RAW])
+NO_NAME_UNANCHORED_COMBINED: Optional[Pattern] = (
+    compile_combined(_NO_NAME_UNANCHORED_RAW) if _NO_NAME_UNANCHORED_RAW else None
+)
+NAME_INDICATOR_COMBINED: Pattern = compile_combined(NAME_INDICATOR_PATTERNS_RAW)
+
+NO_NAME_HS_DB = compile_hyperscan(_NO_NAME_REGEX_RAW)
+
+# Prescreen: більшість NO_NAME паттернів починаються з фіксованого слова
+NO_NAME_LITERAL_PREFIXES, _NO_NAME_UNPREFIXED_RAW = build_prefix_screen(_NO_NAME_ANCHORED_RAW)
+NO_NAME_UNPREFIXED_COMBINED: Optional[Pattern] = (
+    compile_combined([p[1:] for p in _NO_NAME_UNPREFIXED_RAW]) if _NO_NAME_UNPREFIXED_RAW else None
+)
+
+
+def normalize(text: str) -> str:
+    """Normalize comment once per request: strip + lowercase"""
+    return text.strip().lower()
+
 
 def matches_no_name_pattern(text: str) -> bool:
     """Check if text matches any NO_NAME pattern"""
-    text = text.strip()
-    for pattern in NO_NAME_PATTERNS:
-        if pattern.search(text):
-            return True
-    return False
+    return _matches_no_name_pattern_prenormalized(normalize(text))
 
 
 def matches_name_indicator(text: str) -> bool:
     """Check if text likely contains a name"""
-    text = text.strip()
-    for pattern in NAME_INDICATOR_PATTERNS:
-        if pattern.search(text):
-            return True
-    return False
+    return _matches_name_indicator_prenormalized(normalize(text))
+
+
+def _matches_no_name_pattern_prenormalized(normalized: str) -> bool:
+    """
+    matches_no_name_pattern for text already passed through normalize().
+
+    Паттерни в нижньому регістрі, тож Hyperscan (CASELESS надійний лише для
+    ASCII) і prescreen працюють на нормалізованому тексті без повторного lower().
+    """
+    if normalized in EXACT_NO_NAME:
+        return True
+    if NO_NAME_HS_DB is not None:
+        return _hyperscan_matches(NO_NAME_HS_DB, normalized)
+    if NO_NAME_UNANCHORED_COMBINED is not None and NO_NAME_UNANCHORED_COMBINED.search(normalized):
+        return True
+    # Жоден літеральний префікс не збігся — перевіряємо лише решту паттернів
+    if normalized.startswith(NO_NAME_LITERAL_PREFIXES):
+        return NO_NAME_COMBINED.match(normalized) is not None
+    if NO_NAME_UNPREFIXED_COMBINED is None:
+        return False
+    return NO_NAME_UNPREFIXED_COMBINED.match(normalized) is not None
+
+
+def _matches_name_indicator_prenormalized(normalized: str) -> bool:
+    """matches_name_indicator for text already passed through normalize()"""
+    return NAME_INDICATOR_COMBINED.search(normalized) is not None
@@ -7,7 +7,7 @@ from contextlib import asynccontextmanager
 from apscheduler.schedulers.background import BackgroundScheduler
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 
 from app.config import get_settings
 from app.models.schemas import (
@@ -53,21 +53,24 @@ async def lifespan(app: FastAPI):
     logger.info("=" * 60)
 
     # Auto-setup on first run
-    settings = get_settings()
     setup_manager = SetupManager()
 
-    # Check and download models if needed
-    setup_manager.setup_all()
-
-    # Оновлення санкцій при старті
-    logger.info("Updating sanctions list...")
-    _update_sanctions_and_reload()
-
-    # Щоденне оновлення о 3:00 (Europe/Kyiv)
+    # Check and download models if needed (пропускаємо, якщо нічого не змінилось
+    # з останнього успішного setup — той самий відбиток .setup_ok, що й у run.py)
+    if setup_manager.is_setup_cached():
+        logger.info("Setup cache hit, skipping model checks")
+    else:
+        setup_manager.setup_all()
+    setup_manager.close()
+
+    # Щоденне оновлення санкцій о 3:00 (Europe/Kyiv) + одноразово при старті.
+    # Стартове оновлення (мережа, до хвилин) іде у фоні: поки що працює
+    # список з диска, reload() підмінить його атомарно
     _scheduler = BackgroundScheduler(timezone="Europe/Kyiv")
     _scheduler.add_job(_update_sanctions_and_reload, "cron", hour=3, minute=0)
+    _scheduler.add_job(_update_sanctions_and_reload)
     _scheduler.start()
-    logger.info("Sanctions daily update scheduled at 03:00 (Europe/Kyiv)")
+    logger.info("Sanctions update started in background; daily update scheduled at 03:00 (Europe/Kyiv)")
 
     # Initialize pipeline
     pipeline = get_pipeline()
@@ -84,6 +87,7 @@ async def lifespan(app: FastAPI):
     # Shutdown
     if _scheduler:
         _scheduler.shutdown(wait=False)
+    pipeline.shutdown()
     logger.info("Shutting down...")
 
 
@@ -93,7 +97,8 @@ app = FastAPI(
     title=settings.app_name,
     description="API для визначення ПІБ у платіжних коментарях",
     version="0.1.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -101,8 +106,8 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],  # лише методи, які реально використовуються
+    allow_headers=["Content-Type", "Authorization"],
 )
 
 
@@ -125,7 +130,8 @@ async def detect_name(request: CommentRequest):
     try:
         pipeline = get_pipeline()
         result = await pipeline.process(request.comment)
-        return result
+        # Модель вже валідна — серіалізуємо напряму, без повторної валідації response_model
+        return Response(content=result.model_dump_json(), media_type="application/json")
     except Exception as e:
         logger.error(f"Error processing request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -153,12 +159,23 @@ async def get_stats():
     return pipeline.get_stats()
 
 
+@app.delete("/cache/clear")
+async def clear_cache():
+    """Очистити кеш результатів (разом з кешем відповідей LLM)"""
+    pipeline = get_pipeline()
+    pipeline.clear_cache()
+    return {"message": "Cache cleared"}
+
+
 @app.get("/setup-status", response_model=SetupStatus)
 async def setup_status():
     """Перевірити статус налаштування моделей"""
     setup_manager = SetupManager()
-    status = setup_manager.verify_setup()
-    status["ready"] = status["spacy_model"] and (status["llm_model"] or not get_settings().llm_enabled)
+    try:
+        status = setup_manager.verify_setup()
+    finally:
+        setup_manager.close()
+    status["ready"] = status["spacy_model"] and (status["llm_model"] or not settings.llm_enabled)
     return status
 
 
@@ -166,8 +183,11 @@ async def setup_status():
 async def run_setup():
     """Запустити автоматичне налаштування (завантаження моделей)"""
     setup_manager = SetupManager()
-    success = setup_manager.setup_all()
-    status = setup_manager.verify_setup()
+    try:
+        success = setup_manager.setup_all()
+        status = setup_manager.verify_setup()
+    finally:
+        setup_manager.close()
 
     if success:
         # Reinitialize pipeline with new models
@@ -199,8 +219,8 @@ async def download_logs():
 
     return FileResponse(
         path=log_path,
-        filename="requests.csv",
-        media_type="text/csv"
+        filename=log_path.name,
+        media_type="application/x-ndjson" if log_path.suffix == ".ndjson" else "text/csv"
     )
 
 
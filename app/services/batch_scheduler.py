@@ -0,0 +1,105 @@
+"""Async micro-batching: coalesce concurrent requests into one batch call"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """
+    Coalesces concurrent submit() calls into batches.
+
+    Фоновий task чекає на перший елемент, далі добирає ще до max_batch
+    елементів протягом timeout_ms і викликає run_batch(items) один раз.
+    run_batch повертає по одному результату на елемент, у тому ж порядку.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch: int,
+        timeout_ms: float,
+        name: str = "batch"
+    ):
+        self._run_batch = run_batch
+        self._max_batch = max(1, max_batch)
+        self._timeout = timeout_ms / 1000
+        self._name = name
+        # Черга і flusher створюються ліниво — у running event loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._tasks: set = set()  # сильні посилання на батчі в роботі
+        self._closed = False
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result"""
+        if self._closed:
+            raise RuntimeError(f"{self._name} batch scheduler is closed")
+        if self._flusher is None:
+            self._queue = asyncio.Queue()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _flush_loop(self) -> None:
+        """Collect up to max_batch items within the window and dispatch them"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._timeout
+            try:
+                while len(batch) < self._max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # close() посеред збору батчу: зібране вже не буде відправлено
+                self._fail(batch, RuntimeError(f"{self._name} batch scheduler is closed"))
+                raise
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: list) -> None:
+        """Run one batch and resolve the waiting futures"""
+        try:
+            results = await self._run_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"got {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.error(f"{self._name} batch of {len(batch)} failed: {e}")
+            self._fail(batch, e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: list, error: BaseException) -> None:
+        """Resolve every still-pending future of the batch with the error"""
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def close(self) -> None:
+        """Stop the background flusher and fail items that are still queued"""
+        self._closed = True
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._queue is not None:
+            pending = []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            self._fail(pending, RuntimeError(f"{self._name} batch scheduler is closed"))
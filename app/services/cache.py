@@ -2,62 +2,103 @@
 
 import hashlib
 import logging
-from typing import Optional
-
-from cachetools import LRUCache
+from collections import OrderedDict
+from typing import Hashable, List, Optional
 
 from app.models.schemas import NameDetectionResponse
 from app.config import get_settings
 
+try:
+    # xxh3: швидкий некриптографічний 64-бітний хеш
+    import xxhash
+except ImportError:
+    xxhash = None
+
 logger = logging.getLogger(__name__)
 
+# Кількість шардів (степінь двійки — вибір шарду через bitmask)
+CACHE_SHARDS = 8
+
+
+def content_key(text: str) -> int:
+    """
+    64-bit cache key of a comment: casefold + collapsed whitespace, then hashed.
+
+    Варіанти з іншим регістром/пробілами потрапляють в один запис,
+    а кеш тримає 8-байтний int замість повного рядка.
+    """
+    data = " ".join(text.casefold().split()).encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
 
 class CacheService:
-    """LRU Cache for name detection results"""
+    """
+    LRU Cache for name detection results.
+
+    Sharded into CACHE_SHARDS independent OrderedDicts keyed by hash(key).
+    Every single OrderedDict operation is atomic under the GIL; the races
+    between them (eviction by another thread) are tolerated instead of
+    serializing all requests on a lock.
+    """
 
     def __init__(self):
         self.settings = get_settings()
-        self._cache: Optional[LRUCache] = None
+        self._shards: Optional[List[OrderedDict]] = None
+        self._shard_maxsize = max(1, self.settings.cache_maxsize // CACHE_SHARDS)
         self._hits = 0
         self._misses = 0
 
         if self.settings.cache_enabled:
-            self._cache = LRUCache(maxsize=self.settings.cache_maxsize)
+            self._shards = [OrderedDict() for _ in range(CACHE_SHARDS)]
             logger.info(f"Cache initialized with maxsize={self.settings.cache_maxsize}")
 
     @property
     def is_enabled(self) -> bool:
-        return self._cache is not None
+        return self._shards is not None
 
-    def _get_key(self, comment: str) -> str:
-        """Generate cache key from comment"""
-        normalized = comment.strip().lower()
-        return hashlib.md5(normalized.encode()).hexdigest()
+    def _shard(self, key: Hashable) -> OrderedDict:
+        return self._shards[hash(key) & (CACHE_SHARDS - 1)]
 
-    def get(self, comment: str) -> Optional[NameDetectionResponse]:
-        """Get cached result"""
+    def get(self, key: Hashable) -> Optional[NameDetectionResponse]:
+        """Get cached result (key: content_key(comment) or another normalized key)"""
         if not self.is_enabled:
             return None
 
-        key = self._get_key(comment)
-        result = self._cache.get(key)
+        shard = self._shard(key)
+        result = shard.get(key)
 
         if result is not None:
+            try:
+                shard.move_to_end(key)
+            except KeyError:
+                pass  # evicted by another thread meanwhile
             self._hits += 1
-            logger.debug(f"Cache hit for: {comment[:30]}...")
+            logger.debug("Cache hit")
             return result
 
         self._misses += 1
         return None
 
-    def set(self, comment: str, response: NameDetectionResponse) -> None:
-        """Cache result"""
+    def __contains__(self, key: Hashable) -> bool:
+        """Membership check without touching LRU order or hit/miss stats"""
+        return self.is_enabled and key in self._shard(key)
+
+    def set(self, key: Hashable, response: NameDetectionResponse) -> None:
+        """Cache result (key: content_key(comment) or another normalized key)"""
         if not self.is_enabled:
             return
 
-        key = self._get_key(comment)
-        self._cache[key] = response
-        logger.debug(f"Cached result for: {comment[:30]}...")
+        shard = self._shard(key)
+        shard[key] = response
+        try:
+            shard.move_to_end(key)
+            while len(shard) > self._shard_maxsize:
+                shard.popitem(last=False)
+        except KeyError:
+            pass  # concurrent eviction already trimmed the shard
+        logger.debug("Cached result")
 
     def get_stats(self) -> dict:
         """Get cache statistics"""
@@ -66,7 +107,7 @@ class CacheService:
 
         return {
             "enabled": self.is_enabled,
-            "size": len(self._cache) if self._cache else 0,
+            "size": sum(len(s) for s in self._shards) if self._shards else 0,
             "maxsize": self.settings.cache_maxsize,
             "hits": self._hits,
             "misses": self._misses,
@@ -75,8 +116,9 @@ class CacheService:
 
     def clear(self) -> None:
         """Clear cache"""
-        if self._cache:
-            self._cache.clear()
+        if self._shards:
+            for shard in self._shards:
+                shard.clear()
             self._hits = 0
             self._misses = 0
             logger.info("Cache cleared")
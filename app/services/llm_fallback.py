@@ -1,16 +1,26 @@
 """Tier 3: LLM Fallback - Ollama or llama.cpp for complex cases"""
 
 import re
+import atexit
 import asyncio
 import logging
-import threading
-from typing import Optional
+import queue
+from functools import lru_cache
+from typing import List, Optional
 from concurrent.futures import ThreadPoolExecutor
 
 import httpx
+import orjson
+
+try:
+    # pyahocorasick: усі стоп-слова за один прохід по тексту
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 from app.models.schemas import NameCategory, NameDetectionResponse
 from app.config import get_settings
+from app.services.cache import CacheService, content_key
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +48,133 @@ PROMPT_TEMPLATE = """<start_of_turn>user
 <start_of_turn>model
 """
 
+# Статична частина промпту (до коментаря) — однакова для всіх запитів,
+# тому її KV-кеш обчислюємо один раз (prefix caching); промпт збирається
+# конкатенацією PROMPT_PREFIX + comment + PROMPT_SUFFIX, без str.format
+PROMPT_PREFIX, PROMPT_SUFFIX = PROMPT_TEMPLATE.split("{comment}")
+
+# GBNF-граматика відповіді (llama.cpp): декодер може згенерувати лише один
+# з 5 форматів, тож не витрачає токени на зайвий текст
+ANSWER_GRAMMAR = r'''
+root ::= full | surname-name | surname | name | none
+full ::= "ПОВНЕ_ПІБ | " word " " word " " word
+surname-name ::= "ПРІЗВИЩЕ_ІМЯ | " word " " word
+surname ::= "ТІЛЬКИ_ПРІЗВИЩЕ | " word
+name ::= "ТІЛЬКИ_ІМЯ | " word
+none ::= "НЕМАЄ_ПІБ"
+word ::= part ("-" part)?
+part ::= [А-ЯІЇЄҐ] [а-яіїєґ'’ʼ]*
+'''
+
+# Відповідь — один короткий рядок: зупиняємось на кінці рядка/репліки
+STOP_SEQUENCES = ["\n", "<end_of_turn>", "Коментар:"]
+
+# Тіло запитів до Ollama серіалізуємо orjson, тож заголовок ставимо самі
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Незмінні відповіді "ПІБ немає" Tier 3 (як NO_NAME_RESPONSE у Tier 1):
+# LLM відповів НЕМАЄ_ПІБ / ім'я відкинуто (стоп-слово або галюцинація)
+LLM_NO_NAME_RESPONSE = NameDetectionResponse(
+    has_name=False, category=NameCategory.NO_NAME,
+    detected_name=None, confidence=0.9, tier_used=3
+)
+LLM_REJECTED_RESPONSE = NameDetectionResponse(
+    has_name=False, category=NameCategory.NO_NAME,
+    detected_name=None, confidence=0.7, tier_used=3
+)
+
+# Ім'я у вільній відповіді LLM (без "КАТЕГОРІЯ | ...")
+_NAME_RE = re.compile(r'([А-ЯІЇЄҐ][а-яіїєґ\']+(?:\s+[А-ЯІЇЄҐ][а-яіїєґ\']+)*)')
+
+# Мітки категорій у форматі відповіді "КАТЕГОРІЯ | Ім'я"
+_CATEGORY_MAP = {
+    "ПОВНЕ_ПІБ": NameCategory.FULL_NAME,
+    "ПРІЗВИЩЕ_ІМЯ": NameCategory.SURNAME_NAME,
+    "ТІЛЬКИ_ПРІЗВИЩЕ": NameCategory.SURNAME_ONLY,
+    "ТІЛЬКИ_ІМЯ": NameCategory.NAME_ONLY,
+}
+
+# Типові закінчення українських прізвищ
+SURNAME_ENDINGS = (
+    'енко', 'ченко', 'ук', 'чук', 'юк', 'ак', 'як',
+    'ський', 'цький', 'зький', 'ний', 'ий', 'ов', 'ев', 'єв',
+    'ін', 'їн', 'ко', 'ло', 'но', 'шин', 'ишин'
+)
+
+# Стоп-слова які часто помилково розпізнаються як імена
+STOP_WORDS = frozenset({
+    'заробітна', 'зарплата', 'премія', 'аванс', 'виплата', 'переказ',
+    'оплата', 'рахунок', 'поповнення', 'товари', 'послуги', 'плата',
+    'прізвище', 'ім\'я', 'імя', 'батькові',
+    'картки', 'карток', 'картка', 'рахунки', 'рахунків',
+    'допомога', 'допомоги', 'соціальна', 'матеріальна',
+    'квартальна', 'річна', 'місячна'
+})
+
+
+def _build_stop_words_automaton():
+    """Aho-Corasick automaton over STOP_WORDS (None if pyahocorasick is missing)"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in STOP_WORDS:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+
+_STOP_WORDS_AC = _build_stop_words_automaton()
+
+# Фолбек без pyahocorasick: одна скомпільована альтернація (скан у C),
+# довші слова першими
+_STOP_WORDS_RE = re.compile("|".join(
+    re.escape(w) for w in sorted(STOP_WORDS, key=len, reverse=True)
+))
+
+
+def _contains_stop_word(name_lower: str) -> bool:
+    """Check whether any stop word occurs as a substring of the lowercased name"""
+    if _STOP_WORDS_AC is not None:
+        return next(_STOP_WORDS_AC.iter(name_lower), None) is not None
+    return _STOP_WORDS_RE.search(name_lower) is not None
+
+
+def _category_from_label(category_str: str) -> NameCategory:
+    """Map the category label of an LLM answer (already upper-cased)"""
+    category = _CATEGORY_MAP.get(category_str.strip(' "\'*-'))
+    if category is not None:
+        return category
+    # Нестандартна мітка — шукаємо ключові слова
+    if "ПОВНЕ" in category_str:
+        return NameCategory.FULL_NAME
+    if "ПРІЗВИЩЕ" in category_str and "ІМЯ" in category_str:
+        return NameCategory.SURNAME_NAME
+    if "ТІЛЬКИ_ПРІЗВИЩЕ" in category_str:
+        return NameCategory.SURNAME_ONLY
+    if "ТІЛЬКИ_ІМЯ" in category_str:
+        return NameCategory.NAME_ONLY
+    return NameCategory.NO_NAME
+
+
+def _category_by_words(words: List[str]) -> NameCategory:
+    """Category by word count; a single word is a surname if it has a surname ending"""
+    if len(words) >= 3:
+        return NameCategory.FULL_NAME
+    if len(words) == 2:
+        return NameCategory.SURNAME_NAME
+    # Одне слово - визначаємо прізвище це чи ім'я за закінченням
+    if words[0].lower().endswith(SURNAME_ENDINGS):
+        return NameCategory.SURNAME_ONLY
+    return NameCategory.NAME_ONLY
+
+
+@lru_cache(maxsize=1)
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Process-wide executor for LLM calls (shared by all LLMFallback instances)"""
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-fallback")
+    atexit.register(executor.shutdown, wait=False)
+    return executor
+
 
 class LLMFallback:
     """
@@ -53,12 +190,19 @@ class LLMFallback:
 
     def __init__(self):
         self.settings = get_settings()
-        self._llm = None  # For llama.cpp
+        # For llama.cpp: пул контекстів (Llama, state після prefill PROMPT_PREFIX, граматика).
+        # Один контекст не thread-safe, тож кожен запит бере власний з пулу.
+        self._llm_pool: Optional[queue.Queue] = None
+        self._http: Optional[httpx.Client] = None  # For Ollama (keep-alive pool)
         self._loaded = False
-        self._executor = ThreadPoolExecutor(max_workers=self.settings.llm_max_concurrent)
-        self._semaphore = asyncio.Semaphore(self.settings.llm_max_concurrent)
-        # llama.cpp не thread-safe — серіалізуємо виклики
-        self._llm_lock = threading.Lock()
+        # Потоків рівно стільки, скільки контекстів у пулі llama.cpp:
+        # кожен worker бере власний контекст і ніхто не простоює на блокуванні
+        pool_size = max(1, self.settings.llm_max_concurrent)
+        self._executor = _get_executor(pool_size)
+        self._semaphore = asyncio.Semaphore(pool_size)
+        # Окремий кеш відповідей LLM: ключ — вже очищений коментар,
+        # тож повторні рядки (напр. зарплатні) не йдуть на інференс вдруге
+        self._cache = CacheService()
 
     def load(self) -> bool:
         """Initialize LLM backend"""
@@ -75,34 +219,50 @@ class LLMFallback:
             return self._init_llama_cpp()
 
     def _init_ollama(self) -> bool:
-        """Initialize Ollama backend"""
+        """
+        Initialize Ollama backend.
+
+        /api/tags перевіряється один раз при завантаженні: якщо сервер
+        недоступний, Tier 3 вимкнено і is_available/health це показують.
+        Усі запити (з потоків pipeline) йдуть через один httpx.Client —
+        keep-alive пул замість нового з'єднання на кожен коментар.
+        """
+        limit = self.settings.llm_max_concurrent
+        self._http = httpx.Client(
+            base_url=self.settings.ollama_base_url,
+            limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+            timeout=self.settings.llm_timeout
+        )
         try:
-            response = httpx.get(
-                f"{self.settings.ollama_base_url}/api/tags",
-                timeout=5.0
-            )
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                model_names = [m.get("name", "") for m in models]
-                logger.info(f"Ollama connected. Available models: {model_names}")
-
-                if not any(self.settings.ollama_model in name for name in model_names):
-                    logger.warning(
-                        f"Model '{self.settings.ollama_model}' not found. "
-                        f"Run: ollama pull {self.settings.ollama_model}"
-                    )
-
-                self._loaded = True
-                return True
+            response = self._http.get("/api/tags", timeout=5.0)
+            if response.status_code != 200:
+                logger.error(f"Ollama error: {response.status_code}")
+                self.close()
+                return False
+
+            models = orjson.loads(response.content).get("models", [])
+            model_names = {m.get("name", "") for m in models}
+            logger.info(f"Ollama connected. Available models: {sorted(model_names)}")
+
+            if not any(name.startswith(self.settings.ollama_model) for name in model_names):
+                logger.warning(
+                    f"Model '{self.settings.ollama_model}' not found. "
+                    f"Run: ollama pull {self.settings.ollama_model}"
+                )
         except httpx.ConnectError:
             logger.warning(
                 "Ollama not running. Start with: ollama serve\n"
                 f"Then pull model: ollama pull {self.settings.ollama_model}"
             )
+            self.close()
+            return False
         except Exception as e:
             logger.error(f"Failed to connect to Ollama: {e}")
+            self.close()
+            return False
 
-        return False
+        self._loaded = True
+        return True
 
     def _init_llama_cpp(self) -> bool:
         """Initialize llama.cpp backend"""
@@ -116,13 +276,34 @@ class LLMFallback:
         try:
             from llama_cpp import Llama
 
-            logger.info(f"Loading LLM model: {model_path}")
-            self._llm = Llama(
-                model_path=str(model_path),
-                n_ctx=self.settings.llm_context_length,
-                n_threads=self.settings.llm_threads,
-                verbose=False
+            pool_size = max(1, self.settings.llm_max_concurrent)
+            # Ділимо потоки між контекстами, щоб не було oversubscription
+            n_threads = max(1, self.settings.llm_threads_resolved // pool_size)
+            logger.info(
+                f"Loading LLM model: {model_path} "
+                f"({pool_size} context(s) x {n_threads} thread(s))"
             )
+
+            try:
+                from llama_cpp import LlamaGrammar
+            except ImportError:
+                LlamaGrammar = None
+
+            pool = queue.Queue(maxsize=pool_size)
+            for _ in range(pool_size):
+                # Ваги mmap-ляться, тож контексти ділять одну копію моделі в RAM
+                llm = Llama(
+                    model_path=str(model_path),
+                    n_ctx=self.settings.llm_context_length,
+                    n_threads=n_threads,
+                    n_batch=self.settings.llm_n_batch,
+                    n_ubatch=self.settings.llm_n_ubatch,
+                    n_gpu_layers=self.settings.llm_n_gpu_layers,
+                    verbose=False
+                )
+                pool.put((llm, self._warm_prompt_prefix(llm), self._build_grammar(LlamaGrammar)))
+
+            self._llm_pool = pool
             self._loaded = True
             logger.info("LLM model loaded successfully")
             return True
@@ -134,6 +315,37 @@ class LLMFallback:
 
         return False
 
+    def _warm_prompt_prefix(self, llm):
+        """Prefill the static prompt prefix once and return the KV state snapshot"""
+        try:
+            prefix_tokens = llm.tokenize(
+                PROMPT_PREFIX.encode("utf-8"), add_bos=True, special=True
+            )
+            llm.eval(prefix_tokens)
+            logger.info(f"Prompt prefix cached: {len(prefix_tokens)} tokens")
+            return llm.save_state()
+        except Exception as e:
+            # Без кешу префікса все працює, лише повільніше
+            logger.warning(f"Failed to cache prompt prefix: {e}")
+            return None
+
+    @staticmethod
+    def _build_grammar(grammar_cls):
+        """Compile ANSWER_GRAMMAR (one instance per context — grammar state is per-generation)"""
+        if grammar_cls is None:
+            return None
+        try:
+            return grammar_cls.from_string(ANSWER_GRAMMAR, verbose=False)
+        except Exception as e:
+            # Без граматики працює вільна генерація + парсер
+            logger.warning(f"Failed to compile answer grammar: {e}")
+            return None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Process-wide pool for blocking LLM calls (shut down at exit)"""
+        return self._executor
+
     @property
     def is_loaded(self) -> bool:
         return self._loaded
@@ -147,34 +359,50 @@ class LLMFallback:
         if not self.is_available:
             return None
 
+        key = content_key(comment)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
         if self.settings.llm_backend == "ollama":
-            return self._process_ollama_sync(comment)
+            result = self._process_ollama_sync(comment)
         else:
-            return self._process_llama_cpp_sync(comment)
+            result = self._process_llama_cpp_sync(comment)
+
+        if result is not None:
+            self._cache.set(key, result)
+        return result
+
+    def _ollama_payload(self, comment: str) -> bytes:
+        """Request body for Ollama /api/generate (JSON bytes)"""
+        return orjson.dumps({
+            "model": self.settings.ollama_model,
+            "prompt": PROMPT_PREFIX + comment + PROMPT_SUFFIX,
+            "stream": False,
+            # Модель лишається в пам'яті — Ollama перевикористовує кеш спільного префікса
+            "keep_alive": self.settings.ollama_keep_alive,
+            "options": {
+                "temperature": self.settings.llm_temperature,
+                "num_predict": self.settings.llm_max_tokens,
+                # Greedy decoding: одна детермінована відповідь (і кешується краще)
+                "top_k": 1,
+                "top_p": 1.0,
+                "stop": STOP_SEQUENCES,
+            }
+        })
 
     def _process_ollama_sync(self, comment: str) -> Optional[NameDetectionResponse]:
         """Process with Ollama"""
-        prompt = PROMPT_TEMPLATE.format(comment=comment)
-
         try:
-            response = httpx.post(
-                f"{self.settings.ollama_base_url}/api/generate",
-                json={
-                    "model": self.settings.ollama_model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": self.settings.llm_temperature,
-                        "num_predict": self.settings.llm_max_tokens,
-                    }
-                },
-                timeout=self.settings.llm_timeout
+            response = self._http.post(
+                "/api/generate", content=self._ollama_payload(comment), headers=_JSON_HEADERS
             )
 
             if response.status_code == 200:
-                result = response.json()
+                result = orjson.loads(response.content)
                 output = result.get("response", "").strip()
-                logger.debug(f"Ollama output: {output}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Ollama output: {output}")
                 return self._parse_llm_response(output, comment)
             else:
                 logger.error(f"Ollama error: {response.status_code}")
@@ -187,24 +415,35 @@ class LLMFallback:
         return None
 
     def _process_llama_cpp_sync(self, comment: str) -> Optional[NameDetectionResponse]:
-        """Process with llama.cpp (thread-safe: llama.cpp не підтримує паралельні виклики)"""
-        if self._llm is None:
+        """Process with llama.cpp (контекст береться з пулу — паралельно до llm_max_concurrent)"""
+        if self._llm_pool is None:
             return None
 
-        prompt = PROMPT_TEMPLATE.format(comment=comment)
+        prompt = PROMPT_PREFIX + comment + PROMPT_SUFFIX
 
         try:
-            with self._llm_lock:
-                response = self._llm(
+            llm, prefix_state, grammar = self._llm_pool.get()
+            try:
+                if prefix_state is not None:
+                    # Відновлюємо KV-кеш префікса: llama.cpp знайде спільний
+                    # префікс токенів і виконає prefill лише для коментаря
+                    llm.load_state(prefix_state)
+                response = llm(
                     prompt,
                     max_tokens=self.settings.llm_max_tokens,
                     temperature=self.settings.llm_temperature,
-                    stop=["\n", "Коментар:"],
-                    echo=False
+                    top_k=1,
+                    top_p=1.0,
+                    stop=STOP_SEQUENCES,
+                    echo=False,
+                    grammar=grammar
                 )
+            finally:
+                self._llm_pool.put((llm, prefix_state, grammar))
 
             output = response["choices"][0]["text"].strip()
-            logger.debug(f"LLM output: {output}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"LLM output: {output}")
             return self._parse_llm_response(output, comment)
 
         except Exception as e:
@@ -219,9 +458,8 @@ class LLMFallback:
 
         async with self._semaphore:
             try:
-                loop = asyncio.get_event_loop()
                 result = await asyncio.wait_for(
-                    loop.run_in_executor(self._executor, self.process_sync, comment),
+                    asyncio.get_running_loop().run_in_executor(self._executor, self.process_sync, comment),
                     timeout=self.settings.llm_timeout
                 )
                 return result
@@ -232,18 +470,26 @@ class LLMFallback:
                 logger.error(f"LLM async error: {e}")
                 return None
 
+    def get_cache_stats(self) -> dict:
+        """Statistics of the LLM response cache"""
+        return self._cache.get_stats()
+
+    def clear_cache(self) -> None:
+        """Clear the LLM response cache"""
+        self._cache.clear()
+
+    def close(self) -> None:
+        """Close the shared Ollama HTTP client"""
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
     def _parse_llm_response(self, output: str, original_comment: str = "") -> NameDetectionResponse:
         """Parse LLM response into structured response"""
         output = output.strip()
 
         if "НЕМАЄ_ПІБ" in output or "немає" in output.lower():
-            return NameDetectionResponse(
-                has_name=False,
-                category=NameCategory.NO_NAME,
-                detected_name=None,
-                confidence=0.9,
-                tier_used=3
-            )
+            return LLM_NO_NAME_RESPONSE
 
         name = None
         category = NameCategory.NO_NAME
@@ -253,121 +499,45 @@ class LLMFallback:
             category_str = parts[0].strip().upper()
             name = parts[1].strip() if len(parts) > 1 else None
 
-            if "ПОВНЕ_ПІБ" in category_str or "ПОВНЕ" in category_str:
-                category = NameCategory.FULL_NAME
-            elif "ПРІЗВИЩЕ_ІМЯ" in category_str or ("ПРІЗВИЩЕ" in category_str and "ІМЯ" in category_str):
-                category = NameCategory.SURNAME_NAME
-            elif "ТІЛЬКИ_ПРІЗВИЩЕ" in category_str:
-                category = NameCategory.SURNAME_ONLY
-            elif "ТІЛЬКИ_ІМЯ" in category_str:
-                category = NameCategory.NAME_ONLY
-            elif name:
+            category = _category_from_label(category_str)
+            if category == NameCategory.NO_NAME and name:
                 # Категорія не розпізнана, але є ім'я - визначаємо за кількістю слів
-                words = name.split()
-                if len(words) >= 3:
-                    category = NameCategory.FULL_NAME
-                elif len(words) == 2:
-                    category = NameCategory.SURNAME_NAME
-                else:
-                    word = words[0].lower()
-                    surname_endings = (
-                        'енко', 'ченко', 'ук', 'чук', 'юк', 'ак', 'як',
-                        'ський', 'цький', 'зький', 'ний', 'ий', 'ов', 'ев', 'єв',
-                        'ін', 'їн', 'ко', 'ло', 'но', 'шин', 'ишин'
-                    )
-                    if word.endswith(surname_endings):
-                        category = NameCategory.SURNAME_ONLY
-                    else:
-                        category = NameCategory.NAME_ONLY
+                category = _category_by_words(name.split())
         else:
-            name_match = re.search(
-                r'([А-ЯІЇЄҐ][а-яіїєґ\']+(?:\s+[А-ЯІЇЄҐ][а-яіїєґ\']+)*)',
-                output
-            )
+            name_match = _NAME_RE.search(output)
             if name_match:
                 name = name_match.group(1)
-                words = name.split()
-                if len(words) >= 3:
-                    category = NameCategory.FULL_NAME
-                elif len(words) == 2:
-                    category = NameCategory.SURNAME_NAME
-                else:
-                    # Одне слово - визначаємо прізвище це чи ім'я за закінченням
-                    word = words[0].lower()
-                    # Типові закінчення українських прізвищ
-                    surname_endings = (
-                        'енко', 'ченко', 'ук', 'чук', 'юк', 'ак', 'як',
-                        'ський', 'цький', 'зький', 'ний', 'ий', 'ов', 'ев', 'єв',
-                        'ін', 'їн', 'ко', 'ло', 'но', 'шин', 'ишин'
-                    )
-                    if word.endswith(surname_endings):
-                        category = NameCategory.SURNAME_ONLY
-                    else:
-                        category = NameCategory.NAME_ONLY
+                category = _category_by_words(name.split())
 
         has_name = category != NameCategory.NO_NAME
-
-        # Стоп-слова які часто помилково розпізнаються як імена
-        STOP_WORDS = {
-            'заробітна', 'зарплата', 'премія', 'аванс', 'виплата', 'переказ',
-            'оплата', 'рахунок', 'поповнення', 'товари', 'послуги', 'плата',
-            'прізвище', 'ім\'я', 'імя', 'батькові',
-            'картки', 'карток', 'картка', 'рахунки', 'рахунків',
-            'допомога', 'допомоги', 'соціальна', 'матеріальна',
-            'квартальна', 'річна', 'місячна'
-        }
+        name_lower = name.lower() if name else ""
 
         # Перевірка на стоп-слова
-        if has_name and name:
-            name_lower = name.lower()
-            for stop_word in STOP_WORDS:
-                if stop_word in name_lower:
-                    logger.warning(f"Stop word detected in name: '{name}'")
-                    return NameDetectionResponse(
-                        has_name=False,
-                        category=NameCategory.NO_NAME,
-                        detected_name=None,
-                        confidence=0.7,
-                        tier_used=3
-                    )
+        if has_name and name and _contains_stop_word(name_lower):
+            logger.warning(f"Stop word detected in name: '{name}'")
+            return LLM_REJECTED_RESPONSE
 
         # Валідація: перевіряємо що знайдене ім'я дійсно є в оригінальному тексті
         if has_name and name and original_comment:
             # Перевіряємо кожну частину імені
             name_parts = name.split()
-            found_parts = [part for part in name_parts if part.lower() in original_comment.lower()]
+            comment_lower = original_comment.lower()
+            found_parts = [
+                part for part, part_lower in zip(name_parts, name_lower.split())
+                if part_lower in comment_lower
+            ]
 
             # Якщо жодна частина не знайдена - це повна галюцінація
             if len(found_parts) == 0:
                 logger.warning(f"LLM hallucination detected: '{name}' not found in '{original_comment}'")
-                return NameDetectionResponse(
-                    has_name=False,
-                    category=NameCategory.NO_NAME,
-                    detected_name=None,
-                    confidence=0.7,
-                    tier_used=3
-                )
+                return LLM_REJECTED_RESPONSE
 
             # Якщо знайдено тільки частину - використовуємо тільки знайдені частини
             if len(found_parts) < len(name_parts):
                 logger.info(f"Partial match: using '{' '.join(found_parts)}' instead of '{name}'")
                 name = ' '.join(found_parts)
                 # Перевизначаємо категорію
-                if len(found_parts) >= 3:
-                    category = NameCategory.FULL_NAME
-                elif len(found_parts) == 2:
-                    category = NameCategory.SURNAME_NAME
-                else:
-                    word = found_parts[0].lower()
-                    surname_endings = (
-                        'енко', 'ченко', 'ук', 'чук', 'юк', 'ак', 'як',
-                        'ський', 'цький', 'зький', 'ний', 'ий', 'ов', 'ев', 'єв',
-                        'ін', 'їн', 'ко', 'ло', 'но', 'шин', 'ишин'
-                    )
-                    if word.endswith(surname_endings):
-                        category = NameCategory.SURNAME_ONLY
-                    else:
-                        category = NameCategory.NAME_ONLY
+                category = _category_by_words(found_parts)
 
         return NameDetectionResponse(
             has_name=has_name,
@@ -376,8 +546,3 @@ class LLMFallback:
             confidence=0.85,
             tier_used=3
         )
-
-    def __del__(self):
-        """Cleanup"""
-        if hasattr(self, '_executor'):
-            self._executor.shutdown(wait=False)
@@ -2,7 +2,9 @@
 
 import re
 import logging
-from typing import Optional, List, Tuple
+import threading
+from functools import lru_cache
+from typing import Optional, List, Sequence, Tuple
 from dataclasses import dataclass
 
 from app.models.schemas import NameCategory, NameDetectionResponse
@@ -10,8 +12,49 @@ from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
-
-@dataclass
+# Спільна відповідь "ПІБ немає" для Tier 2 (NER не знайшов PER) — будуємо один раз
+NER_NO_NAME_RESPONSE = NameDetectionResponse(
+    has_name=False,
+    category=NameCategory.NO_NAME,
+    detected_name=None,
+    confidence=0.8,  # Less confident than Tier 1
+    tier_used=2
+)
+
+# Компоненти spaCy, які не потрібні для doc.ents — не завантажуємо взагалі
+SPACY_UNUSED_PIPES = ["tagger", "morphologizer", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+# Слово з великої літери (кирилиця)
+_WORD = r"[А-ЯІЇЄҐ][а-яіїєґ\']+"
+# Закінчення по батькові (укр./рос.)
+_PATRONYMIC_ENDINGS = r"ович|івна|овна|евич|ївна|евна|ич|івич"
+_PATRONYMIC_SUFFIX = rf"(?:{_PATRONYMIC_ENDINGS})"
+
+# Скомпільовані один раз на модуль, а не на кожен виклик
+_PATRONYMIC_RE = re.compile(_PATRONYMIC_SUFFIX + r"$", re.IGNORECASE)
+# Common Ukrainian surname endings — одна альтернація замість циклу endswith
+_SURNAME_ENDING_RE = re.compile(r"(?:енко|ко|чук|юк|ук|ський|цький|ов|ев|єв|ін|їн|ак|як|ик)$")
+# Full name pattern: Прізвище Ім'я По-батькові (третє слово закінчується на по батькові)
+FULL_NAME_RE = re.compile(rf"({_WORD})\s+({_WORD})\s+([А-ЯІЇЄҐ][а-яіїєґ\']+{_PATRONYMIC_SUFFIX})")
+# Рівно 3 слова; група 4 — закінчення по батькові (None, якщо його немає)
+_THREE_WORDS_RE = re.compile(rf"^({_WORD})\s+({_WORD})\s+([А-ЯІЇЄҐ][а-яіїєґ\']+?({_PATRONYMIC_ENDINGS})?)$")
+_TWO_NAME_RE = re.compile(rf"({_WORD})\s+({_WORD})")
+
+
+# Прізвища/по батькові повторюються між коментарями — кешуємо за lowercase-словом
+@lru_cache(maxsize=4096)
+def _is_patronymic(word_lower: str) -> bool:
+    """Check whether the (lowercased) word ends with a patronymic suffix"""
+    return _PATRONYMIC_RE.search(word_lower) is not None
+
+
+@lru_cache(maxsize=4096)
+def _looks_like_surname(word_lower: str) -> bool:
+    """Heuristic to check if (lowercased) word looks like a surname"""
+    return _SURNAME_ENDING_RE.search(word_lower) is not None
+
+
+@dataclass(slots=True)
 class NameParts:
     """Extracted name parts"""
     surname: Optional[str] = None
@@ -34,18 +77,38 @@ class NEREngine:
         self.settings = get_settings()
         self._nlp = None
         self._loaded = False
+        # load() може викликатись з фонового потоку і з першого запиту одночасно
+        self._load_lock = threading.Lock()
 
     def load(self) -> bool:
         """Load spaCy model"""
         if self._loaded:
             return True
 
+        with self._load_lock:
+            if self._loaded:
+                return True
+            return self._load_model()
+
+    def load_in_background(self) -> None:
+        """Start loading the model in a daemon thread (first request waits on the lock)"""
+        threading.Thread(target=self.load, name="spacy-load", daemon=True).start()
+
+    def _load_model(self) -> bool:
+        """Actually load the spaCy pipeline (called under _load_lock)"""
         try:
             import spacy
+            if self.settings.ner_use_gpu:
+                # prefer_gpu — м'який фолбек на CPU, якщо GPU/cupy недоступні
+                logger.info(f"spaCy GPU enabled: {spacy.prefer_gpu()}")
             logger.info(f"Loading spaCy model: {self.settings.spacy_model}")
-            self._nlp = spacy.load(self.settings.spacy_model)
+            self._nlp = spacy.load(self.settings.spacy_model, exclude=SPACY_UNUSED_PIPES)
+            # tok2vec потрібен лише якщо ner слухає спільний шар (listener)
+            if "tok2vec" in self._nlp.pipe_names:
+                if "ner" not in self._nlp.get_pipe("tok2vec").listening_components:
+                    self._nlp.disable_pipe("tok2vec")
             self._loaded = True
-            logger.info("spaCy model loaded successfully")
+            logger.info(f"spaCy model loaded successfully (pipes: {self._nlp.pipe_names})")
             return True
         except Exception as e:
             logger.error(f"Failed to load spaCy model: {e}")
@@ -68,32 +131,67 @@ class NEREngine:
                 return None, 0.0
 
         comment = comment.strip()
-        doc = self._nlp(comment)
-
-        # Extract person entities
-        persons = [ent for ent in doc.ents if ent.label_ == "PER"]
 
         # Сначала пробуем паттерн-матчинг для полных имен (3 слова)
-        # Это важно, так как NER может не распознать редкие фамилии
+        # Это важно, так как NER может не распознать редкие фамилии.
+        # Уверенный паттерн возвращаем сразу — spaCy не вызываем вовсе
         name_parts = self._extract_name_by_pattern(comment)
         if name_parts and name_parts.confidence > 0.7:
             return self._create_response(name_parts), name_parts.confidence
 
-        if not persons:
+        return self._process_doc(self._nlp(comment), name_parts)
+
+    def process_many(
+        self, comments: List[str], batch_size: int = 64
+    ) -> List[Tuple[Optional[NameDetectionResponse], float]]:
+        """
+        Process several comments; spaCy runs once over the batch via nlp.pipe.
+
+        Results are identical to calling process() per comment.
+        """
+        if not self._loaded:
+            if not self.load():
+                return [(None, 0.0)] * len(comments)
+
+        results: List[Tuple[Optional[NameDetectionResponse], float]] = [(None, 0.0)] * len(comments)
+        pending = []  # (index, comment, name_parts) — потрібен spaCy
+        for i, comment in enumerate(comments):
+            comment = comment.strip()
+            name_parts = self._extract_name_by_pattern(comment)
+            if name_parts and name_parts.confidence > 0.7:
+                results[i] = self._create_response(name_parts), name_parts.confidence
+            else:
+                pending.append((i, comment, name_parts))
+
+        docs = self._nlp.pipe((comment for _, comment, _ in pending), batch_size=batch_size)
+        for (i, _, name_parts), doc in zip(pending, docs):
+            results[i] = self._process_doc(doc, name_parts)
+
+        return results
+
+    def _process_doc(
+        self, doc, name_parts: Optional[NameParts]
+    ) -> Tuple[Optional[NameDetectionResponse], float]:
+        """Reconcile spaCy entities of a parsed doc with the regex pattern result"""
+        # Найдовша PER-сутність за один прохід; довжина — через межі символів,
+        # щоб не матеріалізувати .text для кожної сутності
+        best_person = None
+        best_len = 0
+        for ent in doc.ents:
+            if ent.label_ != "PER":
+                continue
+            ent_len = ent.end_char - ent.start_char
+            if best_person is None or ent_len > best_len:
+                best_person = ent
+                best_len = ent_len
+
+        if best_person is None:
             # Try pattern-based extraction as fallback
             if name_parts and name_parts.confidence > 0.5:
                 return self._create_response(name_parts), name_parts.confidence
 
-            return NameDetectionResponse(
-                has_name=False,
-                category=NameCategory.NO_NAME,
-                detected_name=None,
-                confidence=0.8,  # Less confident than Tier 1
-                tier_used=2
-            ), 0.8
+            return NER_NO_NAME_RESPONSE, NER_NO_NAME_RESPONSE.confidence
 
-        # Get the most relevant person entity
-        best_person = max(persons, key=lambda e: len(e.text))
         name_parts_ner = self._parse_name_parts(best_person.text)
 
         # Если NER нашел только 2 слова, но паттерн нашел 3 - используем паттерн
@@ -108,81 +206,48 @@ class NEREngine:
 
         return self._create_response(name_parts_ner), name_parts_ner.confidence
 
-    def _parse_name_parts(self, text: str) -> NameParts:
-        """Parse extracted name into parts"""
+    def _parse_name_parts(self, text: str, parts: Optional[Sequence[str]] = None) -> NameParts:
+        """Parse extracted name into parts (parts — вже розбитий text, якщо є)"""
         text = text.strip()
-        parts = text.split()
+        if parts is None:
+            parts = text.split()
+        n_parts = len(parts)
 
-        result = NameParts(raw_text=text)
-
-        if len(parts) == 0:
-            return result
-
-        # Patronymic patterns (Ukrainian/Russian)
-        patronymic_patterns = [
-            r'.*ович$', r'.*івна$', r'.*овна$', r'.*евич$',
-            r'.*ївна$', r'.*евна$', r'.*ич$', r'.*івич$'
-        ]
-
-        def is_patronymic(word: str) -> bool:
-            for pattern in patronymic_patterns:
-                if re.match(pattern, word, re.IGNORECASE):
-                    return True
-            return False
-
-        if len(parts) == 3:
+        # Результат повністю визначається кількістю слів + однією перевіркою суфікса
+        if n_parts == 3:
             # Full name: Surname FirstName Patronymic
-            result.surname = parts[0]
-            result.first_name = parts[1]
-            result.patronymic = parts[2]
-            result.confidence = 0.95 if is_patronymic(parts[2]) else 0.7
+            confidence = 0.95 if _is_patronymic(parts[2].lower()) else 0.7
+            return NameParts(parts[0], parts[1], parts[2], text, confidence)
 
-        elif len(parts) == 2:
+        if n_parts == 2:
             # Two parts: could be Surname+FirstName or FirstName+Patronymic
-            if is_patronymic(parts[1]):
-                result.first_name = parts[0]
-                result.patronymic = parts[1]
-                result.confidence = 0.85
-            else:
-                result.surname = parts[0]
-                result.first_name = parts[1]
-                result.confidence = 0.8
+            if _is_patronymic(parts[1].lower()):
+                return NameParts(None, parts[0], parts[1], text, 0.85)
+            return NameParts(parts[0], parts[1], None, text, 0.8)
 
-        elif len(parts) == 1:
+        if n_parts == 1:
             # Single word - likely surname or first name
-            if self._looks_like_surname(parts[0]):
-                result.surname = parts[0]
-                result.confidence = 0.6
-            else:
-                result.first_name = parts[0]
-                result.confidence = 0.5
-
-        return result
-
-    def _looks_like_surname(self, word: str) -> bool:
-        """Heuristic to check if word looks like a surname"""
-        # Common Ukrainian surname endings
-        surname_endings = [
-            'ко', 'енко', 'ук', 'юк', 'чук', 'ський', 'цький',
-            'ов', 'ев', 'єв', 'ін', 'їн', 'ак', 'як', 'ик'
-        ]
-        word_lower = word.lower()
-        for ending in surname_endings:
-            if word_lower.endswith(ending):
-                return True
-        return False
+            if _looks_like_surname(parts[0].lower()):
+                return NameParts(parts[0], None, None, text, 0.6)
+            return NameParts(None, parts[0], None, text, 0.5)
 
-    def _extract_name_by_pattern(self, text: str) -> Optional[NameParts]:
-        """Try to extract name using regex patterns when NER fails"""
+        return NameParts(raw_text=text)
 
-        # Full name pattern: Прізвище Ім'я По-батькові
-        # Более гибкий паттерн - третье слово должно заканчиваться на отчество
-        full_name_pattern = r'([А-ЯІЇЄҐ][а-яіїєґ\']+)\s+([А-ЯІЇЄҐ][а-яіїєґ\']+)\s+([А-ЯІЇЄҐ][а-яіїєґ\']+(?:ович|івна|овна|евич|ївна|евна|ич|івич))'
-        match = re.search(full_name_pattern, text)
+    def _extract_name_by_pattern(self, text: str) -> Optional[NameParts]:
+        """Try to extract name using regex patterns when NER fails (text вже без пробілів по краях)"""
+
+        # Текст рівно з 3 слів — один anchored match одразу каже, чи є по батькові;
+        # інакше шукаємо повне ПІБ всередині довшого тексту
+        match = _THREE_WORDS_RE.match(text)
+        if match is None:
+            # Более гибкий паттерн - третье слово должно заканчиваться на отчество
+            match = FULL_NAME_RE.search(text)
+        elif match.group(4) is None:
+            match = None
         if match:
             # Проверяем, что первое слово может быть фамилией
             surname = match.group(1)
-            if self._looks_like_surname(surname) or len(surname) > 3:
+            if len(surname) > 3 or _looks_like_surname(surname.lower()):
                 return NameParts(
                     surname=match.group(1),
                     first_name=match.group(2),
@@ -199,31 +264,8 @@ class NEREngine:
                 confidence=0.85
             )
 
-        # Более простой паттерн для 3 слов без строгой проверки отчества
-        # На случай, если отчество не распознается паттерном
-        three_words_pattern = r'^([А-ЯІЇЄҐ][а-яіїєґ\']+)\s+([А-ЯІЇЄҐ][а-яіїєґ\']+)\s+([А-ЯІЇЄҐ][а-яіїєґ\']+)$'
-        match = re.match(three_words_pattern, text.strip())
-        if match:
-            # Если третье слово похоже на отчество - это полное имя
-            third_word = match.group(3)
-            patronymic_patterns = [
-                r'.*ович$', r'.*івна$', r'.*овна$', r'.*евич$',
-                r'.*ївна$', r'.*евна$', r'.*ич$', r'.*івич$'
-            ]
-            is_patronymic = any(re.match(p, third_word, re.IGNORECASE) for p in patronymic_patterns)
-            
-            if is_patronymic:
-                return NameParts(
-                    surname=match.group(1),
-                    first_name=match.group(2),
-                    patronymic=match.group(3),
-                    raw_text=match.group(0),
-                    confidence=0.9
-                )
-
         # Two name pattern
-        two_name_pattern = r'([А-ЯІЇЄҐ][а-яіїєґ\']+)\s+([А-ЯІЇЄҐ][а-яіїєґ\']+)'
-        match = re.search(two_name_pattern, text)
+        match = _TWO_NAME_RE.search(text)
         if match:
             return NameParts(
                 surname=match.group(1),
@@ -1,23 +1,54 @@
 """Main pipeline orchestrating all tiers"""
 
+import os
 import re
 import time
+import threading
 import logging
 import asyncio
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 from app.models.schemas import NameDetectionResponse, NameCategory, SanctionsCheckResult
-from app.services.quick_filter import QuickFilter
-from app.services.ner_engine import NEREngine
+from app.services.quick_filter import QuickFilter, NO_NAME_RESPONSE
+from app.services.ner_engine import NEREngine, NER_NO_NAME_RESPONSE, FULL_NAME_RE
 from app.services.roberta_ner import get_roberta_ner
 from app.services.llm_fallback import LLMFallback
-from app.services.cache import CacheService
+from app.services.cache import CacheService, content_key
+from app.services.batch_scheduler import BatchScheduler
 from app.services.request_logger import get_request_logger
 from app.services.sanctions_checker import get_sanctions_checker
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Хоч одна велика кирилична літера — без неї NER-моделі ПІБ не знаходять
+_UPPER_CYRILLIC_RE = re.compile(r'[А-ЯІЇЄҐ]')
+
+# Привітання замість ПІБ: точні фрази або префікси "слава ", "зі святим ", "з новим ".
+# Один IGNORECASE-прохід замість .lower() + множини + startswith
+_GREETING_RE = re.compile(
+    r'(?:слава |зі святим |з новим |(?:слава україні|зі святим миколаєм|з новим роком'
+    r'|вітаю з різдвом|з днем народження|з 8 березня)$)',
+    re.IGNORECASE
+)
+
+# Члени enum — синглтони: порівнюємо через `is` без виклику Enum.__eq__
+_FULL_NAME = NameCategory.FULL_NAME
+
+# Незмінні відповіді "ПІБ немає" Tier 2 — будуємо один раз (як NO_NAME_RESPONSE у Tier 1)
+GREETING_RESPONSE = NameDetectionResponse(
+    has_name=False, category=NameCategory.NO_NAME,
+    detected_name=None, confidence=1.0, tier_used=2
+)
+DEFAULT_NO_NAME_RESPONSE = NameDetectionResponse(
+    has_name=False,
+    category=NameCategory.NO_NAME,
+    detected_name=None,
+    confidence=0.5,
+    tier_used=2
+)
+
 
 class NameDetectionPipeline:
     """
@@ -40,15 +71,32 @@ class NameDetectionPipeline:
         self.llm_fallback = LLMFallback()
         self.request_logger = get_request_logger()
         self.sanctions_checker = get_sanctions_checker()
-
-        self._stats = {
-            "total_requests": 0,
-            "tier1_handled": 0,
-            "tier2_handled": 0,
-            "tier2b_handled": 0,  # RoBERTa NER
-            "tier3_handled": 0,
-            "cache_hits": 0
-        }
+        # Власний пул для CPU-bound обробки (spaCy/RoBERTa відпускають GIL),
+        # щоб не конкурувати з іншими задачами в default executor
+        self._executor = ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 4, thread_name_prefix="ner"
+        )
+        # pipeline_batch_size > 1: одночасні запити з process() обробляються батчем
+        self._batcher = BatchScheduler(
+            self._run_batch,
+            max_batch=self.settings.pipeline_batch_size,
+            timeout_ms=self.settings.pipeline_batch_timeout_ms,
+            name="Pipeline"
+        )
+        # LLM-верифікація Tier 2 — у спільному пулі LLMFallback, а не в self._executor:
+        # сабміт із його ж потоків у той самий пул міг би заблокувати всі воркери
+        self._llm_executor = self.llm_fallback.executor
+
+        # Лічильники — атрибути замість dict; process_sync йде з пулу потоків,
+        # тож інкременти під одним lock
+        self._stats_lock = threading.Lock()
+        self._total_requests = 0
+        self._tier1_handled = 0
+        self._tier2_handled = 0
+        self._tier2b_handled = 0  # RoBERTa NER
+        self._tier2b_skipped = 0  # RoBERTa не запускали: spaCy вже дав впевнене ПІБ
+        self._tier3_handled = 0
+        self._cache_hits = 0
 
     def initialize(self) -> dict:
         """Initialize all components and return status"""
@@ -62,48 +110,40 @@ class NameDetectionPipeline:
         else:
             logger.info("LLM fallback is disabled in settings")
         
-        # Load RoBERTa NER (optional - may fail if transformers not installed)
-        roberta_loaded = False
-        try:
-            roberta_loaded = self.roberta_ner.load()
-            if roberta_loaded:
-                logger.info("RoBERTa NER loaded and available")
-        except Exception as e:
-            logger.warning(f"RoBERTa NER failed to load: {e}")
+        # spaCy і RoBERTa (optional — без transformers не завантажиться) вантажаться
+        # у фоні (секунди + сотні MB, RoBERTa ще й warm-up) — старт не чекає;
+        # перший запит, що дійде до Tier 2, дочекається завантаження
+        self.ner_engine.load_in_background()
+        self.roberta_ner.load_in_background()
 
         status = {
             "cache": self.cache.is_enabled,
             "quick_filter": True,
-            "ner_engine": self.ner_engine.load(),
-            "roberta_ner": roberta_loaded,
+            "ner_engine": self.ner_engine.is_loaded,
+            "roberta_ner": self.roberta_ner.is_loaded,
             "llm_fallback": llm_loaded
         }
 
         logger.info(f"Pipeline initialized: {status}")
         logger.info(f"LLM available: {self.llm_fallback.is_available}")
-        logger.info(f"RoBERTa NER available: {self.roberta_ner.is_loaded}")
         logger.info(f"Sanctions checker: {self.sanctions_checker.get_stats()}")
         return status
 
-    GREETING_PHRASES = frozenset({
-        'слава україні', 'зі святим миколаєм', 'з новим роком',
-        'вітаю з різдвом', 'з днем народження', 'з 8 березня',
-    })
+    # Стандартні призначення платежу (після тире — не ПІБ)
+    STANDARD_WORDS = frozenset({'зарплата', 'заробітна', 'премія', 'аванс', 'виплата', 'переказ', 'оплата'})
+    _STANDARD_WORD_MAX_LEN = max(map(len, STANDARD_WORDS))
 
     def _is_greeting_not_name(self, text: str) -> bool:
         """Чи є текст привітанням, а не ПІБ"""
-        if not text:
-            return False
-        t = text.strip().lower()
-        return t in self.GREETING_PHRASES or t.startswith(('слава ', 'зі святим ', 'з новим '))
+        return bool(text and _GREETING_RE.match(text.strip()))
 
     def _extract_full_name_from_text(self, text: str) -> Optional[str]:
         """Витягти повне ПІБ (3 слова) з тексту, якщо є чіткий патерн"""
-        if not text or len(text.split()) < 3:
+        if not text:
             return None
-        # Прізвище Ім'я По-батькові (третє слово — відмінкове закінчення)
-        pat = r'([А-ЯІЇЄҐ][а-яіїєґ\']+)\s+([А-ЯІЇЄҐ][а-яіїєґ\']+)\s+([А-ЯІЇЄҐ][а-яіїєґ\']+(?:ович|івна|овна|евич|ївна|евна|ич|івич))'
-        m = re.search(pat, text.strip())
+        # Прізвище Ім'я По-батькові (той самий скомпільований патерн, що й у NER;
+        # він сам вимагає 3 слова, тож окремий split() не потрібен)
+        m = FULL_NAME_RE.search(text)
         return m.group(0) if m else None
 
     def _with_meta(
@@ -145,67 +185,105 @@ class NameDetectionPipeline:
 
         return result
 
-    def process_sync(self, comment: str) -> NameDetectionResponse:
-        """Synchronous processing"""
-        t0 = time.perf_counter()
-        self._stats["total_requests"] += 1
+    def _extract_processed_comment(self, comment: str) -> str:
+        """
+        Извлекаем часть после первого тире (кастомный комментарий с ПІБ).
+
+        Формат: "Стандартное назначение-Кастомный комментарий с ПІБ"
+        Або: "ПІБ-Призначення" (ім'я перед тире)
+        """
+        head, sep, tail = comment.partition("-")
+        if not sep:
+            return comment
+
+        part_before = head.strip()
+        part_after = tail.strip()
+
+        # Якщо після тире - стандартне призначення (одне слово), беремо частину перед тире.
+        # lower() лише для коротких хвостів — довші за найдовше стандартне слово не збігаються
+        if (
+            part_after
+            and len(part_after) <= self._STANDARD_WORD_MAX_LEN
+            and part_after.lower() in self.STANDARD_WORDS
+            and len(part_before.split()) >= 2
+        ):
+            processed_comment = part_before  # "ПІБ - зарплата"
+        else:
+            processed_comment = part_after or part_before
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Extracted: '{processed_comment}' from '{comment}'")
 
-        # Извлекаем часть после первого тире (кастомный комментарий с ПІБ)
-        # Формат: "Стандартное назначение-Кастомный комментарий с ПІБ"
-        # Або: "ПІБ-Призначення" (ім'я перед тире)
-        original_comment = comment
-        processed_comment = comment
-        STANDARD_WORDS = {'зарплата', 'заробітна', 'премія', 'аванс', 'виплата', 'переказ', 'оплата'}
+        return processed_comment
 
-        if "-" in comment:
-            parts = comment.split("-", 1)
-            part_before = parts[0].strip() if parts[0] else ""
-            part_after = parts[1].strip() if len(parts) > 1 else ""
+    def process_sync(
+        self,
+        comment: str,
+        ner_output: Optional[Tuple[Optional[NameDetectionResponse], float]] = None
+    ) -> NameDetectionResponse:
+        """
+        Synchronous processing.
 
-            # Якщо після тире - стандартне призначення (одне слово), беремо частину перед тире
-            if part_after and part_after.lower() in STANDARD_WORDS and len(part_before.split()) >= 2:
-                processed_comment = part_before  # "ПІБ - зарплата"
-            else:
-                processed_comment = part_after or part_before
-            logger.debug(f"Extracted: '{processed_comment}' from '{original_comment}'")
+        ner_output — вже обчислений результат spaCy (з process_batch), щоб не
+        запускати NER повторно.
+        """
+        t0 = time.perf_counter()
+        with self._stats_lock:
+            self._total_requests += 1
+
+        original_comment = comment
+        cache_key = content_key(original_comment)
+        processed_comment = self._extract_processed_comment(comment)
 
         # Если после тире ничего нет или только пробелы, возвращаем "нет ПІБ"
         if not processed_comment or not processed_comment.strip():
-            result = NameDetectionResponse(
-                has_name=False,
-                category=NameCategory.NO_NAME,
-                detected_name=None,
-                confidence=1.0,
-                tier_used=1
-            )
-            self.cache.set(original_comment, result)
+            result = NO_NAME_RESPONSE
+            self.cache.set(cache_key, result)
             r = self._with_meta(result, "1", t0)
             self.request_logger.log(original_comment, processed_comment, r)
             return r
 
-        # Check cache (используем оригинальный комментарий для кеша)
-        cached = self.cache.get(original_comment)
+        # Check cache (ключ — хеш нормалізованого оригінального коментаря)
+        cached = self.cache.get(cache_key)
         if cached:
-            self._stats["cache_hits"] += 1
+            with self._stats_lock:
+                self._cache_hits += 1
             return self._with_meta(cached, "cache", t0)
 
         # Tier 1: Quick Filter
         result = self.quick_filter.process(processed_comment)
         if result is not None:
-            self._stats["tier1_handled"] += 1
+            with self._stats_lock:
+                self._tier1_handled += 1
             result = self._check_sanctions(result)
-            self.cache.set(original_comment, result)
+            self.cache.set(cache_key, result)
             r = self._with_meta(result, "1", t0)
             self.request_logger.log(original_comment, processed_comment, r)
             return r
 
+        # Текст без жодної великої кириличної літери: spaCy/RoBERTa пропускаємо
+        # (одразу "NER не знайшов"), LLM-верифікація нижче все одно відпрацює
+        run_ner = ner_output is not None or _UPPER_CYRILLIC_RE.search(processed_comment) is not None
+        if not run_ner:
+            ner_output = (NER_NO_NAME_RESPONSE, NER_NO_NAME_RESPONSE.confidence)
+
         # Tier 2a: spaCy NER Engine
-        spacy_result, spacy_confidence = self.ner_engine.process(processed_comment)
+        if ner_output is None:
+            ner_output = self.ner_engine.process(processed_comment)
+        spacy_result, spacy_confidence = ner_output
 
         # Tier 2b: RoBERTa NER (if available)
+        # Якщо spaCy вже знайшов повне ПІБ з високою впевненістю — прохід трансформера не потрібен
         roberta_result = None
         roberta_confidence = 0.0
-        if self.roberta_ner.is_loaded:
+        spacy_sure = (
+            spacy_result is not None
+            and spacy_result.category is _FULL_NAME
+            and spacy_confidence >= self.settings.roberta_skip_threshold
+        )
+        if spacy_sure and self.roberta_ner.is_loaded:
+            with self._stats_lock:
+                self._tier2b_skipped += 1
+        elif run_ner and self.roberta_ner.is_ready:
             try:
                 roberta_result, roberta_confidence = self.roberta_ner.process(processed_comment)
             except Exception as e:
@@ -218,8 +296,8 @@ class NameDetectionPipeline:
         tier_detail = "2a"  # default NER
         if roberta_result and spacy_result:
             # Пріоритет: повне ПІБ (FULL_NAME) над частковим, потім за confidence
-            spacy_full = spacy_result.category == NameCategory.FULL_NAME
-            roberta_full = roberta_result.category == NameCategory.FULL_NAME
+            spacy_full = spacy_result.category is _FULL_NAME
+            roberta_full = roberta_result.category is _FULL_NAME
             if spacy_full and not roberta_full:
                 result = spacy_result
                 confidence = spacy_confidence
@@ -248,54 +326,62 @@ class NameDetectionPipeline:
             tier_detail = "2a"
 
         if result is not None:
-            # Верифікуємо через LLM якщо доступний і впевненість низька
+            # Верифікуємо через LLM якщо доступний і впевненість низька.
+            # LLM іде в окремому пулі (llama.cpp/Ollama відпускають GIL), а тим часом
+            # доводимо NER-результат і перевіряємо його на санкції
+            llm_future = None
             if self.llm_fallback.is_available and confidence < self.settings.llm_verification_threshold:
+                llm_future = self._llm_executor.submit(self.llm_fallback.process_sync, processed_comment)
+
+            # Використовуємо результат NER - але відкидаємо привітання
+            ner_result = result
+            if result.has_name and result.detected_name and self._is_greeting_not_name(result.detected_name):
+                ner_result = GREETING_RESPONSE
+            # Якщо NER повернув часткове ім'я, але текст містить повне ПІБ (3 слова) — коригуємо
+            elif result.has_name and result.category is not _FULL_NAME:
+                full_match = self._extract_full_name_from_text(processed_comment)
+                if full_match:
+                    ner_result = result.model_copy(
+                        update={
+                            "has_name": True,
+                            "category": NameCategory.FULL_NAME,
+                            "detected_name": full_match,
+                            "confidence": max(result.confidence, 0.9),
+                        }
+                    )
+                    logger.debug("Upgraded to FULL_NAME: %s", full_match)
+            ner_result = self._check_sanctions(ner_result)
+
+            if llm_future is not None:
                 try:
-                    llm_result = self.llm_fallback.process_sync(processed_comment)
+                    llm_result = llm_future.result(timeout=self.settings.llm_timeout)
                     if llm_result is not None:
                         # Використовуємо LLM якщо він знайшов повніше ім'я
                         use_llm = (
                             (llm_result.has_name and not result.has_name) or
-                            (llm_result.category == NameCategory.FULL_NAME and
-                             result.category != NameCategory.FULL_NAME) or
+                            (llm_result.category is _FULL_NAME and
+                             result.category is not _FULL_NAME) or
                             (llm_result.confidence > confidence + 0.1)
                         )
                         if use_llm:
-                            logger.debug(f"LLM verified: {llm_result.category}")
-                            self._stats["tier3_handled"] += 1
+                            logger.debug("LLM verified: %s", llm_result.category)
+                            with self._stats_lock:
+                                self._tier3_handled += 1
                             llm_result = self._check_sanctions(llm_result)
-                            self.cache.set(original_comment, llm_result)
+                            self.cache.set(cache_key, llm_result)
                             r = self._with_meta(llm_result, "3", t0)
                             self.request_logger.log(original_comment, processed_comment, r)
                             return r
                 except Exception as e:
+                    # У т.ч. TimeoutError — відповідаємо результатом NER
                     logger.warning(f"LLM verification failed: {e}")
 
-            # Використовуємо результат NER - але відкидаємо привітання
-            if result.has_name and result.detected_name and self._is_greeting_not_name(result.detected_name):
-                result = NameDetectionResponse(
-                    has_name=False, category=NameCategory.NO_NAME,
-                    detected_name=None, confidence=1.0, tier_used=2
-                )
-            # Якщо NER повернув часткове ім'я, але текст містить повне ПІБ (3 слова) — коригуємо
-            elif result.has_name and result.category != NameCategory.FULL_NAME:
-                full_match = self._extract_full_name_from_text(processed_comment)
-                if full_match:
-                    result = result.model_copy(
-                        update={
-                            "has_name": True,
-                            "category": NameCategory.FULL_NAME,
-                            "detected_name": full_match,
-                            "confidence": max(result.confidence, 0.9),
-                        }
-                    )
-                    logger.debug(f"Upgraded to FULL_NAME: {full_match}")
-            self._stats["tier2_handled"] += 1
-            if tier_detail == "2b":
-                self._stats["tier2b_handled"] += 1
-            result = self._check_sanctions(result)
-            self.cache.set(original_comment, result)
-            r = self._with_meta(result, tier_detail, t0)
+            with self._stats_lock:
+                self._tier2_handled += 1
+                if tier_detail == "2b":
+                    self._tier2b_handled += 1
+            self.cache.set(cache_key, ner_result)
+            r = self._with_meta(ner_result, tier_detail, t0)
             self.request_logger.log(original_comment, processed_comment, r)
             return r
 
@@ -303,60 +389,96 @@ class NameDetectionPipeline:
         if self.llm_fallback.is_available:
             llm_result = self.llm_fallback.process_sync(processed_comment)
             if llm_result is not None:
-                self._stats["tier3_handled"] += 1
+                with self._stats_lock:
+                    self._tier3_handled += 1
                 llm_result = self._check_sanctions(llm_result)
-                self.cache.set(original_comment, llm_result)
+                self.cache.set(cache_key, llm_result)
                 r = self._with_meta(llm_result, "3", t0)
                 self.request_logger.log(original_comment, processed_comment, r)
                 return r
 
         # Should not reach here, but return default
-        default_result = NameDetectionResponse(
-            has_name=False,
-            category=NameCategory.NO_NAME,
-            detected_name=None,
-            confidence=0.5,
-            tier_used=2
-        )
-        self.cache.set(original_comment, default_result)
+        default_result = DEFAULT_NO_NAME_RESPONSE
+        self.cache.set(cache_key, default_result)
         r = self._with_meta(default_result, "2a", t0)
         self.request_logger.log(original_comment, processed_comment, r)
         return r
 
+    def process_batch(self, comments: List[str]) -> List[NameDetectionResponse]:
+        """
+        Process several comments; spaCy runs once over all Tier-2 comments (nlp.pipe).
+
+        Cache and Tier 1 are checked up front so that only comments which would
+        actually reach Tier 2 are sent to spaCy. Results match process_sync.
+        """
+        processed = [self._extract_processed_comment(c) for c in comments]
+        tier2 = [
+            i for i, (comment, processed_comment) in enumerate(zip(comments, processed))
+            if _UPPER_CYRILLIC_RE.search(processed_comment)
+            and content_key(comment) not in self.cache
+            and self.quick_filter.process(processed_comment) is None
+        ]
+
+        ner_outputs = dict(zip(tier2, self.ner_engine.process_many([processed[i] for i in tier2])))
+        return [self.process_sync(c, ner_output=ner_outputs.get(i)) for i, c in enumerate(comments)]
+
     async def process(self, comment: str) -> NameDetectionResponse:
-        """Async processing - uses thread pool for CPU-bound operations"""
-        # For now, delegate to sync version in thread pool
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.process_sync, comment)
+        """Async processing - uses the pipeline's thread pool for CPU-bound operations"""
+        if self.settings.pipeline_batch_size > 1:
+            return await self._batcher.submit(comment)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.process_sync, comment
+        )
+
+    async def _run_batch(self, comments: List[str]) -> List[NameDetectionResponse]:
+        """Process a coalesced batch in the thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.process_batch, comments
+        )
+
+    def shutdown(self) -> None:
+        """Stop the batcher, the pipeline thread pool and the LLM HTTP client (app lifespan)"""
+        self._batcher.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.llm_fallback.close()
+
+    def clear_cache(self) -> None:
+        """Clear the result cache and the LLM response cache"""
+        self.cache.clear()
+        self.llm_fallback.clear_cache()
 
     def get_stats(self) -> dict:
         """Get pipeline statistics"""
-        total = self._stats["total_requests"]
+        total = self._total_requests
         if total == 0:
             percentages = {"tier1": 0, "tier2": 0, "tier2b": 0, "tier3": 0, "cache": 0}
         else:
             percentages = {
-                "tier1": self._stats["tier1_handled"] / total * 100,
-                "tier2": self._stats["tier2_handled"] / total * 100,
-                "tier2b": self._stats["tier2b_handled"] / total * 100,
-                "tier3": self._stats["tier3_handled"] / total * 100,
-                "cache": self._stats["cache_hits"] / total * 100
+                "tier1": self._tier1_handled / total * 100,
+                "tier2": self._tier2_handled / total * 100,
+                "tier2b": self._tier2b_handled / total * 100,
+                "tier3": self._tier3_handled / total * 100,
+                "cache": self._cache_hits / total * 100
             }
 
         return {
             "total_requests": total,
-            "tier1_handled": self._stats["tier1_handled"],
-            "tier2_handled": self._stats["tier2_handled"],
-            "tier2b_handled": self._stats["tier2b_handled"],
-            "tier3_handled": self._stats["tier3_handled"],
-            "cache_hits": self._stats["cache_hits"],
+            "tier1_handled": self._tier1_handled,
+            "tier2_handled": self._tier2_handled,
+            "tier2b_handled": self._tier2b_handled,
+            "tier2b_skipped": self._tier2b_skipped,
+            "tier3_handled": self._tier3_handled,
+            "cache_hits": self._cache_hits,
             "percentages": {k: f"{v:.1f}%" for k, v in percentages.items()},
-            "cache_stats": self.cache.get_stats()
+            "cache_stats": self.cache.get_stats(),
+            "llm_cache_stats": self.llm_fallback.get_cache_stats(),
+            "roberta_stats": self.roberta_ner.get_stats()
         }
 
     def get_health(self) -> dict:
         """Get health status of all components"""
         return {
+            # "not_loaded" одразу після старту — модель ще вантажиться у фоні
             "ner_engine": "loaded" if self.ner_engine.is_loaded else "not_loaded",
             "roberta_ner": "loaded" if self.roberta_ner.is_loaded else "not_loaded",
             "llm_fallback": "available" if self.llm_fallback.is_available else "unavailable",
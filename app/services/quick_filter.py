@@ -5,10 +5,27 @@ import logging
 from typing import Optional, Tuple
 
 from app.models.schemas import NameCategory, NameDetectionResponse
-from app.data.patterns import matches_no_name_pattern, matches_name_indicator
+from app.data.patterns import (
+    normalize,
+    _matches_no_name_pattern_prenormalized,
+    _matches_name_indicator_prenormalized,
+)
 
 logger = logging.getLogger(__name__)
 
+# Лише цифри/пунктуація/валюта (fullmatch — без побудови очищеного рядка)
+_NUMERIC_ONLY_RE = re.compile(r'[\d\s\.,\-+/\\()₴$€грнuahusdeur]*')
+
+# Спільна (незмінна) відповідь "ПІБ немає" для Tier 1 — будуємо один раз.
+# Pipeline не мутує її: _with_meta робить model_copy, санкції лише для has_name.
+NO_NAME_RESPONSE = NameDetectionResponse(
+    has_name=False,
+    category=NameCategory.NO_NAME,
+    detected_name=None,
+    confidence=1.0,
+    tier_used=1
+)
+
 
 class QuickFilter:
     """
@@ -34,40 +51,34 @@ class QuickFilter:
         if not comment:
             return self._no_name_response()
 
-        comment = comment.strip()
+        # strip + lower один раз для всіх перевірок нижче
+        normalized = normalize(comment)
 
         # Too short
-        if len(comment) < self.min_length:
+        if len(normalized) < self.min_length:
             return self._no_name_response()
 
         # Only digits/punctuation
-        if self._is_numeric_only(comment):
+        if self._is_numeric_only(normalized):
             return self._no_name_response()
 
         # Matches definite no-name patterns
-        if matches_no_name_pattern(comment):
-            logger.debug(f"Quick filter: NO_NAME pattern matched for '{comment}'")
+        if _matches_no_name_pattern_prenormalized(normalized):
+            logger.debug("Quick filter: NO_NAME pattern matched for '%s'", comment)
             return self._no_name_response()
 
         # Has clear name indicators - pass to NER
-        if matches_name_indicator(comment):
-            logger.debug(f"Quick filter: name indicator found, passing to NER")
+        if _matches_name_indicator_prenormalized(normalized):
+            logger.debug("Quick filter: name indicator found, passing to NER")
             return None
 
         # Uncertain - pass to next tier
         return None
 
-    def _is_numeric_only(self, text: str) -> bool:
-        """Check if text is only numbers and punctuation"""
-        cleaned = re.sub(r'[\d\s\.,\-+/\\()₴$€грнuahusdeur]+', '', text.lower())
-        return len(cleaned) == 0
+    def _is_numeric_only(self, normalized: str) -> bool:
+        """Check if (normalized) text is only numbers and punctuation"""
+        return _NUMERIC_ONLY_RE.fullmatch(normalized) is not None
 
     def _no_name_response(self) -> NameDetectionResponse:
-        """Create response for no name detected"""
-        return NameDetectionResponse(
-            has_name=False,
-            category=NameCategory.NO_NAME,
-            detected_name=None,
-            confidence=1.0,
-            tier_used=1
-        )
+        """Shared response for no name detected"""
+        return NO_NAME_RESPONSE
@@ -1,20 +1,38 @@
-"""Request logger - saves all requests and responses to CSV for analysis"""
+"""Request logger - saves all requests and responses to CSV (or NDJSON) for analysis"""
 
+import os
 import csv
+import time
+import queue
+import atexit
 import logging
-from datetime import datetime
 from pathlib import Path
 from typing import Optional
 import threading
 
+import orjson
+
 from app.models.schemas import NameDetectionResponse
-from app.config import PROJECT_ROOT
+from app.config import PROJECT_ROOT, get_settings
 
 logger = logging.getLogger(__name__)
 
 # Шлях до файлу логів
 LOGS_DIR = PROJECT_ROOT / "logs"
 REQUEST_LOG_FILE = LOGS_DIR / "requests.csv"
+REQUEST_LOG_NDJSON_FILE = LOGS_DIR / "requests.ndjson"
+
+# Колонки CSV (і ключі записів NDJSON)
+LOG_COLUMNS = (
+    "timestamp", "original_comment", "processed_comment", "has_name",
+    "category", "detected_name", "confidence", "tier_used",
+    "tier_detail", "processing_time_ms", "sanctions_checked",
+    "sanctions_found", "sanctions_matched_name", "sanctions_status",
+)
+
+# Фоновий запис: як часто скидати накопичені рядки у файл
+FLUSH_INTERVAL = 0.1  # seconds
+_STOP = object()  # sentinel для зупинки потоку запису
 
 
 class RequestLogger:
@@ -42,14 +60,14 @@ class RequestLogger:
         # Створюємо директорію логів
         LOGS_DIR.mkdir(exist_ok=True)
 
+        # NDJSON: orjson + один os.write на O_APPEND fd (без csv-екранування)
+        self._ndjson = get_settings().request_log_format == "ndjson"
+        self._path = REQUEST_LOG_NDJSON_FILE if self._ndjson else REQUEST_LOG_FILE
+
         # Ініціалізуємо CSV файл з заголовками
-        NEW_HEADER = [
-            "timestamp", "original_comment", "processed_comment", "has_name",
-            "category", "detected_name", "confidence", "tier_used",
-            "tier_detail", "processing_time_ms", "sanctions_checked",
-            "sanctions_found", "sanctions_matched_name", "sanctions_status",
-        ]
-        if REQUEST_LOG_FILE.exists():
+        if self._ndjson:
+            pass  # NDJSON не має заголовка
+        elif REQUEST_LOG_FILE.exists():
             with open(REQUEST_LOG_FILE, "r", encoding="utf-8") as f:
                 first = f.readline().strip().split(",")
             if "tier_detail" not in first:
@@ -62,28 +80,36 @@ class RequestLogger:
         else:
             self._write_header()
 
-        logger.info(f"Request logger initialized: {REQUEST_LOG_FILE}")
+        # Лічильник записаних рядків — get_stats не перечитує файл
+        self._logged = self._count_existing_rows()
+        # Кеш секундної частини timestamp (лише для writer thread)
+        self._ts_sec = -1
+        self._ts_str = ""
+
+        # log() лише кладе рядок у чергу; пише один фоновий потік пачками
+        self._queue: queue.Queue = queue.Queue()
+        self._writer_thread = threading.Thread(
+            target=self._drain_loop, name="request-logger", daemon=True
+        )
+        self._writer_thread.start()
+        atexit.register(self.close)
+
+        logger.info(f"Request logger initialized: {self._path}")
 
     def _write_header(self):
         """Write CSV header"""
         with open(REQUEST_LOG_FILE, "w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
-            writer.writerow([
-                "timestamp",
-                "original_comment",
-                "processed_comment",
-                "has_name",
-                "category",
-                "detected_name",
-                "confidence",
-                "tier_used",
-                "tier_detail",
-                "processing_time_ms",
-                "sanctions_checked",
-                "sanctions_found",
-                "sanctions_matched_name",
-                "sanctions_status",
-            ])
+            writer.writerow(LOG_COLUMNS)
+
+    def _count_existing_rows(self) -> int:
+        """Count rows already in the log file (once, at startup)"""
+        if not self._path.exists():
+            return 0
+        with open(self._path, "rb") as f:
+            lines = sum(1 for _ in f)
+        # CSV: мінус заголовок
+        return lines if self._ndjson else max(0, lines - 1)
 
     def log(
         self,
@@ -91,54 +117,118 @@ class RequestLogger:
         processed_comment: str,
         response: NameDetectionResponse
     ):
-        """Log request and response to CSV"""
+        """Queue request and response for the writer thread"""
         sc = response.sanctions_check
-        with self._file_lock:
-            try:
-                with open(REQUEST_LOG_FILE, "a", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([
-                        datetime.now().isoformat(),
-                        original_comment,
-                        processed_comment,
-                        response.has_name,
-                        response.category.value,
-                        response.detected_name or "",
-                        response.confidence,
-                        response.tier_used,
-                        response.tier_detail or "",
-                        response.processing_time_ms or "",
-                        sc.checked if sc else False,
-                        sc.found if sc else False,
-                        (sc.matched_name or "") if sc else "",
-                        (sc.status or "") if sc else "",
-                    ])
-            except Exception as e:
-                logger.error(f"Failed to log request: {e}")
+        self._queue.put_nowait((
+            time.time(),  # форматує writer thread (_format_timestamp)
+            original_comment,
+            processed_comment,
+            response.has_name,
+            response.category.value,
+            response.detected_name or "",
+            response.confidence,
+            response.tier_used,
+            response.tier_detail or "",
+            response.processing_time_ms or "",
+            sc.checked if sc else False,
+            sc.found if sc else False,
+            (sc.matched_name or "") if sc else "",
+            (sc.status or "") if sc else "",
+        ))
+
+    def _format_timestamp(self, ts: float) -> str:
+        """Local ISO timestamp; the seconds part is formatted once per second (writer thread only)"""
+        sec = int(ts)
+        if sec != self._ts_sec:
+            self._ts_sec = sec
+            self._ts_str = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec))
+        return f"{self._ts_str}.{int((ts - sec) * 1e6):06d}"
+
+    def _drain_loop(self):
+        """Writer thread: batch-drain the queue into the log file"""
+        if self._ndjson:
+            fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+            def write_rows(rows):
+                os.write(fd, b"".join(orjson.dumps(dict(zip(LOG_COLUMNS, row))) + b"\n" for row in rows))
+
+            close_file = lambda: os.close(fd)
+        else:
+            f = open(REQUEST_LOG_FILE, "a", newline="", encoding="utf-8")
+            writer = csv.writer(f)
+
+            def write_rows(rows):
+                writer.writerows(rows)
+                f.flush()
+
+            close_file = f.close
+
+        try:
+            stop = False
+            while not stop:
+                try:
+                    rows = [self._queue.get(timeout=FLUSH_INTERVAL)]
+                except queue.Empty:
+                    continue
+                try:
+                    while True:
+                        rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+                taken = len(rows)
+                if any(row is _STOP for row in rows):
+                    rows = [row for row in rows if row is not _STOP]
+                    stop = True
+                rows = [(self._format_timestamp(row[0]),) + row[1:] for row in rows]
+
+                with self._file_lock:
+                    try:
+                        write_rows(rows)
+                        self._logged += len(rows)
+                    except Exception as e:
+                        logger.error(f"Failed to log {len(rows)} request(s): {e}")
+                for _ in range(taken):
+                    self._queue.task_done()
+        finally:
+            close_file()
+
+    def flush(self):
+        """Wait until every queued row has been written"""
+        self._queue.join()
+
+    def close(self):
+        """Write the remaining rows and stop the writer thread"""
+        if self._writer_thread.is_alive():
+            self._queue.put(_STOP)
+            self._writer_thread.join(timeout=5)
 
     def get_log_path(self) -> Path:
-        """Get path to log file"""
-        return REQUEST_LOG_FILE
+        """Get path to log file (after writing out queued rows)"""
+        self.flush()
+        return self._path
 
     def get_stats(self) -> dict:
         """Get logging statistics"""
-        if not REQUEST_LOG_FILE.exists():
-            return {"total_logged": 0, "file": str(REQUEST_LOG_FILE)}
+        if not self._path.exists():
+            return {"total_logged": 0, "file": str(self._path)}
 
-        # Рахуємо рядки (мінус заголовок)
-        with open(REQUEST_LOG_FILE, "r", encoding="utf-8") as f:
-            line_count = sum(1 for _ in f) - 1
+        self.flush()
 
         return {
-            "total_logged": max(0, line_count),
-            "file": str(REQUEST_LOG_FILE),
-            "size_kb": REQUEST_LOG_FILE.stat().st_size / 1024
+            "total_logged": self._logged,
+            "file": str(self._path),
+            "size_kb": self._path.stat().st_size / 1024
         }
 
     def clear(self):
         """Clear log file"""
         with self._file_lock:
-            self._write_header()
+            if self._ndjson:
+                open(self._path, "wb").close()
+            else:
+                self._write_header()
+            self._logged = 0
             logger.info("Request log cleared")
 
 
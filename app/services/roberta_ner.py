@@ -1,17 +1,60 @@
 """RoBERTa-based NER for Ukrainian - higher quality name extraction"""
 
+import os
+import time
+import queue
 import logging
 import re
 import threading
+from concurrent.futures import Future
+from contextlib import nullcontext
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
 from typing import Optional, List, Tuple
 
 from app.models.schemas import NameCategory, NameDetectionResponse
-from app.config import get_settings
+from app.config import get_settings, MODELS_DIR
 
 logger = logging.getLogger(__name__)
 
 # Модель для українського NER
 MODEL_NAME = "EvanD/xlm-roberta-base-ukrainian-ner-ukrner"
+# Експортована в ONNX і квантизована (INT8) модель — створюється один раз
+ONNX_MODEL_DIR = MODELS_DIR / "xlm-roberta-ukrner-onnx-int8"
+ONNX_MODEL_FILE = "model_quantized.onnx"
+
+# Контекст, з яким повторюємо NER, якщо на "голому" тексті PER не знайдено
+CONTEXT_PREFIXES = ("Переказ для ", "Платіж для ", "Це ")
+
+
+@lru_cache(maxsize=1)
+def _cpu_flags() -> frozenset:
+    """CPU feature flags from /proc/cpuinfo (empty outside Linux)"""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return frozenset(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return frozenset()
+
+
+def _cpu_has_vnni() -> bool:
+    """AVX-512 VNNI (fast INT8 GEMM)"""
+    return "avx512_vnni" in _cpu_flags()
+
+
+def _cpu_has_bf16() -> bool:
+    """Native bfloat16 matmuls (AVX-512 BF16 or AMX)"""
+    return not _cpu_flags().isdisjoint({"avx512_bf16", "amx_bf16"})
+
+
+def _model_size_mb(model) -> float:
+    """Size of model parameters and buffers in MB"""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors) / 1024 / 1024
 
 
 class RobertaNER:
@@ -31,20 +74,70 @@ class RobertaNER:
         self.settings = get_settings()
         self._pipeline = None
         self._loaded = False
+        self._load_lock = threading.Lock()
+        self._loading = False  # фонове завантаження триває
+        self._load_done = threading.Event()
         self._lock = threading.Lock()  # PyTorch/MPS не завжди thread-safe
+        # roberta_batch_size > 1: черга (text, Future) для фонового потоку мікробатчингу
+        self._batch_queue: Optional[queue.Queue] = None
+        # torch.inference_mode після load(); без torch — порожній контекст
+        self._inference_mode = nullcontext
+        # LRU на точному тексті: офсети start/end прив'язані до нього, тож без нормалізації.
+        # Окремо від кешу pipeline: різні коментарі дають той самий текст після тире
+        self._cached_extract = lru_cache(
+            maxsize=self.settings.roberta_cache_maxsize if self.settings.cache_enabled else 0
+        )(self._extract_uncached)
 
     def load(self) -> bool:
         """Load RoBERTa NER model"""
         if self._loaded:
             return True
 
+        with self._load_lock:
+            if self._loaded:
+                return True
+            return self._load_model()
+
+    def load_in_background(self) -> None:
+        """Start loading (and warming up) the model in a daemon thread"""
+        if self._loaded or self._loading:
+            return
+        self._loading = True
+        self._load_done.clear()
+        threading.Thread(target=self._background_load, name="roberta-load", daemon=True).start()
+
+    def _background_load(self) -> None:
+        try:
+            self.load()
+        finally:
+            self._loading = False
+            self._load_done.set()
+
+    @property
+    def is_ready(self) -> bool:
+        """Loaded; while a background load is running, wait for it first"""
+        if not self._loaded and self._loading:
+            self._load_done.wait()
+        return self._loaded
+
+    def _load_model(self) -> bool:
+        """Actually load the model and build the transformers pipeline (called under _load_lock)"""
         try:
             from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
 
             logger.info(f"Loading RoBERTa NER model: {MODEL_NAME}")
 
+            self._configure_torch()
+
             tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-            model = AutoModelForTokenClassification.from_pretrained(MODEL_NAME)
+            model = self._load_onnx() if self.settings.roberta_onnx else None
+            compiled = False
+            if model is None:
+                model = AutoModelForTokenClassification.from_pretrained(MODEL_NAME)
+                if self.settings.roberta_bf16_compile:
+                    compiled = self._bf16_compile(model)
+                if not compiled:
+                    model = self._maybe_quantize(model)
 
             self._pipeline = pipeline(
                 "ner",
@@ -52,6 +145,11 @@ class RobertaNER:
                 tokenizer=tokenizer,
                 aggregation_strategy="simple"
             )
+            self._warm_up(model, compiled)
+
+            if self.settings.roberta_batch_size > 1:
+                self._batch_queue = queue.Queue()
+                threading.Thread(target=self._batch_loop, name="roberta-batch", daemon=True).start()
 
             self._loaded = True
             logger.info("RoBERTa NER model loaded successfully")
@@ -64,6 +162,126 @@ class RobertaNER:
             logger.error(f"Failed to load RoBERTa NER model: {e}")
             return False
 
+    def _configure_torch(self) -> None:
+        """Inference-only torch: capped intra-op threads, inference_mode for calls"""
+        try:
+            import torch
+        except ImportError:
+            return
+
+        # Кілька процесів uvicorn з torch на всі ядра кожен — oversubscription
+        if self.settings.roberta_torch_threads > 0:
+            torch.set_num_threads(min(self.settings.roberta_torch_threads, os.cpu_count() or 1))
+        try:
+            # Дозволено лише до першої паралельної роботи torch
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+        # Модель лише для інференсу: autograd вимикає inference_mode навколо
+        # кожного виклику (set_grad_enabled діяв би лише на потоці завантаження)
+        self._inference_mode = torch.inference_mode
+
+    def _load_onnx(self):
+        """
+        Load the INT8 ONNX Runtime model (None if optimum/onnxruntime are unavailable).
+
+        Перший запуск: експорт PyTorch -> ONNX і динамічна квантизація,
+        результат кешується в ONNX_MODEL_DIR.
+        """
+        try:
+            import onnxruntime as ort
+            from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        except ImportError as e:
+            logger.warning(f"optimum[onnxruntime] not installed, using PyTorch: {e}")
+            return None
+
+        try:
+            if not (ONNX_MODEL_DIR / ONNX_MODEL_FILE).exists():
+                logger.info(f"Exporting RoBERTa NER to ONNX (INT8): {ONNX_MODEL_DIR}")
+                exported = ORTModelForTokenClassification.from_pretrained(MODEL_NAME, export=True)
+                quantizer = ORTQuantizer.from_pretrained(exported)
+                qconfig = (
+                    AutoQuantizationConfig.avx512_vnni(is_static=False) if _cpu_has_vnni()
+                    else AutoQuantizationConfig.avx2(is_static=False)
+                )
+                quantizer.quantize(save_dir=ONNX_MODEL_DIR, quantization_config=qconfig)
+                exported.config.save_pretrained(ONNX_MODEL_DIR)
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = (
+                self.settings.roberta_torch_threads or max(1, (os.cpu_count() or 2) // 2)
+            )
+            model = ORTModelForTokenClassification.from_pretrained(
+                ONNX_MODEL_DIR, file_name=ONNX_MODEL_FILE, session_options=options
+            )
+            logger.info("RoBERTa NER: using ONNX Runtime INT8 model")
+            return model
+        except Exception as e:
+            logger.warning(f"ONNX Runtime model unavailable, using PyTorch: {e}")
+            return None
+
+    def _bf16_compile(self, model) -> bool:
+        """Cast to bfloat16 and torch.compile the forward (in place); False if not applicable"""
+        try:
+            import torch
+        except ImportError:
+            return False
+        if not (torch.cuda.is_available() or _cpu_has_bf16()):
+            logger.info("RoBERTa bf16 skipped: no CUDA and CPU has no AVX-512 BF16/AMX")
+            return False
+
+        try:
+            model.to(dtype=torch.bfloat16).eval()
+            # Компілюємо лише forward — pipeline і далі бачить PreTrainedModel
+            model.forward = torch.compile(model.forward, mode="max-autotune", dynamic=True)
+            return True
+        except Exception as e:
+            logger.warning(f"RoBERTa bf16/torch.compile failed, using fp32: {e}")
+            model.__dict__.pop("forward", None)
+            model.float()
+            return False
+
+    def _warm_up(self, model, compiled: bool) -> None:
+        """
+        Short and long dummy inferences at load time, so the first request doesn't pay
+        for lazy kernel init / TorchInductor compilation. Compiled model falls back
+        to fp32 eager if warm-up fails.
+        """
+        try:
+            with self._inference_mode():
+                self._pipeline("Іванов Петро Сергійович")
+                self._pipeline("Переказ коштів за послуги згідно договору, отримувач Коваленко Олена Миколаївна")
+            logger.info("RoBERTa NER warmed up")
+        except Exception as e:
+            if not compiled:
+                logger.warning(f"RoBERTa warm-up failed: {e}")
+                return
+            logger.warning(f"RoBERTa torch.compile warm-up failed, using fp32 eager: {e}")
+            model.__dict__.pop("forward", None)
+            model.float()
+
+    def _maybe_quantize(self, model):
+        """INT8 dynamic quantization of Linear layers (CPU only)"""
+        if not self.settings.roberta_quantize:
+            return model
+        if not _cpu_has_vnni():
+            # Без VNNI INT8 GEMM не швидший за fp32 — лишаємо як є
+            logger.info("RoBERTa quantization skipped: CPU has no AVX-512 VNNI")
+            return model
+
+        try:
+            import torch
+
+            size_before = _model_size_mb(model)
+            # Embedding не квантуємо: для нього потрібен float_qparams qconfig, а виграш малий
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            logger.info(f"RoBERTa quantized to INT8: {size_before:.0f} MB -> {_model_size_mb(model):.0f} MB")
+        except Exception as e:
+            logger.warning(f"RoBERTa quantization failed, using fp32: {e}")
+        return model
+
     @property
     def is_loaded(self) -> bool:
         return self._loaded
@@ -82,48 +300,115 @@ class RobertaNER:
             return []
 
         try:
-            with self._lock:
-                results = self._pipeline(text)
-
-                # Фільтруємо тільки PER (Person) entities
-                def is_per(r):
-                    label = r.get("entity_group") or r.get("entity", "")
-                    return label == "PER" or (isinstance(label, str) and "PER" in label.upper())
-
-                persons = [
-                    {"word": r["word"], "score": r["score"], "start": r["start"], "end": r["end"]}
-                    for r in results
-                    if is_per(r)
-                ]
-
-                # Якщо нічого не знайдено - спробуємо додати контекст
-                if not persons:
-                    context_prefixes = [
-                        "Переказ для ",
-                        "Платіж для ",
-                        "Це ",
-                    ]
-                    for prefix in context_prefixes:
-                        augmented = prefix + text
-                        results = self._pipeline(augmented)
-                        for r in results:
-                            if (r.get("entity_group") or r.get("entity", "")) == "PER":
-                                prefix_len = len(prefix)
-                                if r["start"] >= prefix_len:
-                                    persons.append({
-                                        "word": r["word"],
-                                        "score": r["score"],
-                                        "start": r["start"] - prefix_len,
-                                        "end": r["end"] - prefix_len
-                                    })
-                        if persons:
-                            break
-
-            return persons
-
+            persons = self._cached_extract(text)
         except Exception as e:
+            # Помилки не кешуються — lru_cache зберігає лише повернуті значення
             logger.error(f"RoBERTa NER error: {e}")
             return []
+        # Копії — кешований список спільний для всіх викликів
+        return [dict(p) for p in persons]
+
+    def _extract_uncached(self, text: str) -> List[dict]:
+        """Run the model for one text (directly or through the micro-batcher)"""
+        if self._batch_queue is not None:
+            # Мікробатчинг: текст забирає фоновий потік разом з одночасними запитами
+            future = Future()
+            self._batch_queue.put((text, future))
+            return future.result()
+        return self._extract_batch([text])[0]
+
+    def get_stats(self) -> dict:
+        """Result cache statistics"""
+        info = self._cached_extract.cache_info()
+        total = info.hits + info.misses
+        return {
+            "cache_size": info.currsize,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_hit_rate": f"{(info.hits / total * 100) if total else 0:.1f}%"
+        }
+
+    def _run_pipeline(self, inputs, **kwargs):
+        """Call the transformers pipeline under self._lock and inference mode"""
+        # Лише сам pipeline не thread-safe — фільтрація і зсуви нижче
+        # працюють з локальними даними і виконуються поза локом
+        with self._lock, self._inference_mode():
+            return self._pipeline(inputs, **kwargs)
+
+    def _extract_batch(self, texts: List[str]) -> List[List[dict]]:
+        """Run NER over texts in one pipeline call"""
+        if len(texts) == 1:
+            outputs = [self._run_pipeline(texts[0])]
+        else:
+            outputs = self._run_pipeline(texts, batch_size=len(texts))
+
+        # Фільтруємо тільки PER (Person) entities
+        def is_per(r):
+            label = r.get("entity_group") or r.get("entity", "")
+            return label == "PER" or (isinstance(label, str) and "PER" in label.upper())
+
+        all_persons = [
+            [
+                {"word": r["word"], "score": r["score"], "start": r["start"], "end": r["end"]}
+                for r in results
+                if is_per(r)
+            ]
+            for results in outputs
+        ]
+
+        # Якщо нічого не знайдено - спробуємо додати контекст
+        # (усі варіанти для всіх текстів одним батчем, а не проходом моделі на кожен)
+        empty = [i for i, persons in enumerate(all_persons) if not persons]
+        if not empty:
+            return all_persons
+
+        candidates = [prefix + texts[i] for i in empty for prefix in CONTEXT_PREFIXES]
+        batch_results = self._run_pipeline(candidates, batch_size=len(candidates))
+        n = len(CONTEXT_PREFIXES)
+        for k, i in enumerate(empty):
+            persons = all_persons[i]
+            for prefix, results in zip(CONTEXT_PREFIXES, batch_results[k * n:(k + 1) * n]):
+                for r in results:
+                    if (r.get("entity_group") or r.get("entity", "")) == "PER":
+                        prefix_len = len(prefix)
+                        if r["start"] >= prefix_len:
+                            persons.append({
+                                "word": r["word"],
+                                "score": r["score"],
+                                "start": r["start"] - prefix_len,
+                                "end": r["end"] - prefix_len
+                            })
+                if persons:
+                    break
+
+        return all_persons
+
+    def _batch_loop(self) -> None:
+        """Worker thread: coalesce queued texts into one pipeline call"""
+        max_batch = self.settings.roberta_batch_size
+        wait = self.settings.roberta_batch_wait_ms / 1000
+
+        while True:
+            items = [self._batch_queue.get()]
+            deadline = time.monotonic() + wait
+            while len(items) < max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(self._batch_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                outputs = self._extract_batch([text for text, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), persons in zip(items, outputs):
+                future.set_result(persons)
 
     def process(self, text: str) -> Tuple[Optional[NameDetectionResponse], float]:
         """
@@ -190,46 +475,45 @@ class RobertaNER:
         if len(entities) == 1:
             return entities[0]
 
-        # Сортуємо за позицією
-        sorted_entities = sorted(entities, key=lambda x: x["start"])
-
-        # Об'єднуємо сусідні entities (з відстанню <= 2 символи)
-        merged = []
-        current_group = [sorted_entities[0]]
+        # Сортуємо за позицією (HF pipeline зазвичай вже віддає їх упорядкованими,
+        # тож сортування на такому вході лінійне)
+        entities = sorted(entities, key=itemgetter("start"))
 
-        for i in range(1, len(sorted_entities)):
-            prev = sorted_entities[i - 1]
-            curr = sorted_entities[i]
+        # Об'єднуємо сусідні entities (з відстанню <= 2 символи) і одразу
+        # відстежуємо найбільшу групу з найвищим середнім score (перша при рівності)
+        first = last = entities[0]
+        count, total = 1, first["score"]
+        best_key = None
 
+        for curr in chain(entities[1:], (None,)):
             # Якщо відстань між entities <= 2 символи - об'єднуємо
-            gap = curr["start"] - prev["end"]
-            if gap <= 2:
-                current_group.append(curr)
-            else:
-                merged.append(current_group)
-                current_group = [curr]
-
-        merged.append(current_group)
-
-        # Знаходимо найбільшу групу з найвищим середнім score
-        best_group = max(merged, key=lambda g: (len(g), sum(e["score"] for e in g) / len(g)))
-
-        if len(best_group) == 1:
-            return best_group[0]
+            if curr is not None and curr["start"] - last["end"] <= 2:
+                last = curr
+                count += 1
+                total += curr["score"]
+                continue
+
+            key = (count, total / count)
+            if best_key is None or key > best_key:
+                best_key, best_first, best_last = key, first, last
+            if curr is not None:
+                first = last = curr
+                count, total = 1, curr["score"]
+
+        if best_first is best_last:
+            return best_first
 
         # Витягуємо текст з оригіналу
-        start = best_group[0]["start"]
-        end = best_group[-1]["end"]
+        start = best_first["start"]
+        end = best_last["end"]
         combined_text = original_text[start:end].strip()
 
         # Очищаємо від зайвих символів
         combined_text = re.sub(r'\s+', ' ', combined_text)
 
-        avg_score = sum(e["score"] for e in best_group) / len(best_group)
-
         return {
             "word": combined_text,
-            "score": avg_score,
+            "score": best_key[1],
             "start": start,
             "end": end
         }
@@ -1,8 +1,15 @@
 """Sanctions checker service - перевірка імен у санкційному списку РНБО"""
 
 import csv
+import os
+import pickle
 import logging
-import re
+import sys
+import threading
+import unicodedata
+from collections import Counter
+from itertools import chain
+from operator import attrgetter, itemgetter
 from pathlib import Path
 from typing import Optional, List, Dict
 from dataclasses import dataclass
@@ -14,6 +21,18 @@ logger = logging.getLogger(__name__)
 # Шлях до файлу санкцій
 SANCTIONS_FILE = PROJECT_ROOT / "app" / "data" / "sanctions_individuals.csv"
 
+# Кеш розібраного списку (pickle) — валідний, поки mtime і розмір CSV не змінились.
+# Версію треба піднімати при зміні _normalize чи структури індексу
+SANCTIONS_CACHE_FILE = SANCTIONS_FILE.with_name("sanctions_individuals.cache.pkl")
+_CACHE_VERSION = 1
+
+# Апострофи (ASCII, типографський ’, модифікатор ʼ) і дефіси видаляємо
+# через str.translate (таблиця на рівні C, без regex)
+_DROP_PUNCT = str.maketrans("", "", "'’ʼ-")
+
+_SID = attrgetter("sid")
+_COUNT = itemgetter(1)
+
 
 @dataclass
 class SanctionMatch:
@@ -26,6 +45,32 @@ class SanctionMatch:
     confidence: float = 0.0
 
 
+@dataclass(slots=True)
+class SanctionRecord:
+    """Запис санкційного списку (slots — без dict на кожен рядок)"""
+    sid: str
+    name: str
+    translit_name: str
+    aliases: str
+    status: str
+    words: List[str]  # нормалізовані слова імені — для перевірки прізвища/імені в check()
+
+
+@dataclass(frozen=True, slots=True)
+class _Index:
+    """
+    Індекс санкційного списку. reload() підміняє його одним присвоєнням,
+    тож check(), який один раз прочитав self._index, бачить узгоджений знімок.
+    """
+    names: Dict[str, SanctionRecord]  # normalized_name -> record
+    name_parts: Dict[str, List[SanctionRecord]]  # word -> list of records
+    by_sid: Dict[str, SanctionRecord]  # sid -> record
+    surnames: frozenset  # перші слова імен — префільтр часткового пошуку
+
+
+_EMPTY_INDEX = _Index(names={}, name_parts={}, by_sid={}, surnames=frozenset())
+
+
 class SanctionsChecker:
     """
     Перевіряє імена на співпадіння зі санкційним списком РНБО України.
@@ -36,22 +81,8 @@ class SanctionsChecker:
     - Нечутливий до регістру пошук
     """
 
-    _instance: Optional["SanctionsChecker"] = None
-
-    def __new__(cls):
-        """Singleton pattern"""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
-
     def __init__(self):
-        if self._initialized:
-            return
-
-        self._initialized = True
-        self._names: Dict[str, Dict] = {}  # normalized_name -> record
-        self._name_parts: Dict[str, List[Dict]] = {}  # word -> list of records
+        self._index: _Index = _EMPTY_INDEX
         self._loaded = False
 
         self._load_sanctions()
@@ -60,13 +91,10 @@ class SanctionsChecker:
         """Нормалізація тексту для порівняння"""
         if not text:
             return ""
-        # Lowercase, видалення зайвих пробілів
-        text = text.lower().strip()
-        # Видалення апострофів і дефісів
-        text = re.sub(r"['\-]", "", text)
-        # Нормалізація пробілів
-        text = re.sub(r"\s+", " ", text)
-        return text
+        # NFKC (сумісні/складені варіанти літер -> одна форма), lowercase,
+        # видалення апострофів і дефісів, нормалізація пробілів
+        text = unicodedata.normalize("NFKC", text)
+        return " ".join(text.lower().translate(_DROP_PUNCT).split())
 
     def _load_sanctions(self):
         """Завантаження санкційного списку"""
@@ -74,57 +102,132 @@ class SanctionsChecker:
             logger.warning(f"Sanctions file not found: {SANCTIONS_FILE}")
             return
 
+        stat = SANCTIONS_FILE.stat()
+        source = (_CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+        if self._load_cache(source):
+            return
+
+        names: Dict[str, SanctionRecord] = {}
+        name_parts: Dict[str, List[SanctionRecord]] = {}
+        by_sid: Dict[str, SanctionRecord] = {}
         try:
-            with open(SANCTIONS_FILE, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f, delimiter="\t")
+            with open(SANCTIONS_FILE, "r", encoding="utf-8", newline="") as f:
+                # csv.reader + індекси колонок: без dict на кожен рядок
+                reader = csv.reader(f, delimiter="\t")
+                header = next(reader, [])
+                columns = [
+                    header.index(col) if col in header else None
+                    for col in ("sid", "name", "translit_name", "aliases", "status")
+                ]
+                if columns[1] is None:
+                    logger.error(f"Sanctions file has no 'name' column: {SANCTIONS_FILE}")
+                    return
+                width = len(header)
 
                 for row in reader:
-                    name = row.get("name", "").strip()
+                    if len(row) < width:
+                        row += [""] * (width - len(row))
+                    sid, name, translit_name, aliases, status = (
+                        row[i] if i is not None else "" for i in columns
+                    )
+                    name = name.strip()
                     if not name:
                         continue
 
-                    record = {
-                        "sid": row.get("sid", ""),
-                        "name": name,
-                        "translit_name": row.get("translit_name", ""),
-                        "aliases": row.get("aliases", ""),
-                        "status": row.get("status", ""),
-                    }
-
                     # Зберігаємо повне нормалізоване ім'я
                     normalized = self._normalize(name)
-                    self._names[normalized] = record
+                    record = SanctionRecord(
+                        sid=sid,
+                        name=name,
+                        translit_name=translit_name,
+                        aliases=aliases,
+                        status=sys.intern(status),
+                        # Слова (імена, по-батькові) масово повторюються між
+                        # записами — інтернуємо, щоб зберігати один рядок на слово
+                        words=[sys.intern(w) for w in normalized.split()],
+                    )
+                    names[normalized] = record
+                    by_sid.setdefault(sid, record)
 
                     # Зберігаємо кожне слово окремо для часткового пошуку
-                    for word in normalized.split():
+                    for word in record.words:
                         if len(word) >= 3:  # Ігноруємо короткі слова
-                            if word not in self._name_parts:
-                                self._name_parts[word] = []
-                            self._name_parts[word].append(record)
+                            if word not in name_parts:
+                                name_parts[word] = []
+                            name_parts[word].append(record)
 
                     # Також додаємо аліаси
-                    aliases = row.get("aliases", "")
                     if aliases:
                         for alias in aliases.split(";"):
                             alias = alias.strip()
                             if alias:
                                 alias_normalized = self._normalize(alias)
-                                if alias_normalized and alias_normalized not in self._names:
-                                    self._names[alias_normalized] = record
-
+                                if alias_normalized and alias_normalized not in names:
+                                    names[alias_normalized] = record
+
+            self._index = _Index(
+                names=names,
+                name_parts=name_parts,
+                by_sid=by_sid,
+                surnames=frozenset(record.words[0] for record in by_sid.values() if record.words),
+            )
             self._loaded = True
-            logger.info(f"Loaded {len(self._names)} sanctioned names, {len(self._name_parts)} name parts")
+            logger.info(f"Loaded {len(names)} sanctioned names, {len(name_parts)} name parts")
 
         except Exception as e:
             logger.error(f"Failed to load sanctions file: {e}")
+            return
+
+        self._save_cache(source)
+
+    def _load_cache(self, source: tuple) -> bool:
+        """Load the parsed index from SANCTIONS_CACHE_FILE if it matches the CSV"""
+        try:
+            with open(SANCTIONS_CACHE_FILE, "rb") as f:
+                cached_source, names, name_parts, by_sid, surnames = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable sanctions cache: {e}")
+            return False
+
+        if cached_source != source:
+            return False
+
+        self._index = _Index(names=names, name_parts=name_parts, by_sid=by_sid, surnames=surnames)
+        self._loaded = True
+        logger.info(f"Loaded {len(names)} sanctioned names, {len(name_parts)} name parts (cache)")
+        return True
+
+    def _save_cache(self, source: tuple) -> None:
+        """Write the parsed index next to the CSV (temp file + rename)"""
+        tmp_path = SANCTIONS_CACHE_FILE.with_suffix(".pkl.tmp")
+        idx = self._index
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(
+                    (source, idx.names, idx.name_parts, idx.by_sid, idx.surnames),
+                    f, protocol=pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(tmp_path, SANCTIONS_CACHE_FILE)
+        except Exception as e:
+            # Кеш лише прискорює старт — без нього працюємо як раніше
+            logger.warning(f"Could not write sanctions cache: {e}")
+            tmp_path.unlink(missing_ok=True)
 
     def reload(self) -> bool:
-        """Перезавантажити список з файлу (після оновлення CSV)"""
-        self._names.clear()
-        self._name_parts.clear()
-        self._loaded = False
-        self._load_sanctions()
-        return self._loaded
+        """
+        Перезавантажити список з файлу (після оновлення CSV).
+
+        Новий індекс будується окремо і підміняється одним присвоєнням
+        self._index — check() з інших потоків бачить або старий, або новий
+        індекс цілком. Якщо файл не завантажився, лишається попередній список.
+        """
+        fresh = SanctionsChecker()
+        if fresh._loaded:
+            self._index = fresh._index
+            self._loaded = True
+        return fresh._loaded
 
     @property
     def is_loaded(self) -> bool:
@@ -156,16 +259,18 @@ class SanctionsChecker:
                 return SanctionMatch(found=False, match_type="none")
 
         normalized = self._normalize(name)
+        # Один знімок індексу на весь виклик — reload() може підмінити його паралельно
+        idx = self._index
 
         # 1. Точне співпадіння
-        if normalized in self._names:
-            record = self._names[normalized]
+        record = idx.names.get(normalized)
+        if record is not None:
             return SanctionMatch(
                 found=True,
                 match_type="exact",
-                matched_name=record["name"],
-                sid=record["sid"],
-                status=record["status"],
+                matched_name=record.name,
+                sid=record.sid,
+                status=record.status,
                 confidence=1.0
             )
 
@@ -174,36 +279,28 @@ class SanctionsChecker:
         if not name_words:
             return SanctionMatch(found=False, match_type="none")
 
-        # Шукаємо співпадіння по словах
-        matches = {}  # sid -> (record, matched_words_count)
-
-        for word in name_words:
-            if len(word) < 3:
-                continue
-
-            if word in self._name_parts:
-                for record in self._name_parts[word]:
-                    sid = record["sid"]
-                    if sid not in matches:
-                        matches[sid] = (record, 0)
-                    record, count = matches[sid]
-                    matches[sid] = (record, count + 1)
-
-        if not matches:
+        # Частковий збіг вимагає, щоб перше слово (прізвище) збіглося з першим словом
+        # санкційного імені — якщо такого прізвища в списку немає, далі не шукаємо
+        if name_words[0] not in idx.surnames:
             return SanctionMatch(found=False, match_type="none")
 
-        # Знаходимо найкраще співпадіння
-        best_match = None
-        best_count = 0
+        # Шукаємо співпадіння по словах: sid -> matched_words_count.
+        # Counter над map/chain рахує на рівні C, без Python-циклу по записах
+        candidates = [
+            idx.name_parts[word] for word in name_words
+            if len(word) >= 3 and word in idx.name_parts
+        ]
+        if not candidates:
+            return SanctionMatch(found=False, match_type="none")
+        matches = Counter(map(_SID, chain.from_iterable(candidates)))
 
-        for sid, (record, count) in matches.items():
-            # Враховуємо кількість співпадінь відносно кількості слів у шуканому імені
-            if count > best_count:
-                best_count = count
-                best_match = record
+        # Найкраще співпадіння: max() повертає перший sid з найбільшою кількістю
+        best_sid, best_count = max(matches.items(), key=_COUNT)
+        # get(): sid, якого немає в індексі, дає found=False, а не KeyError
+        best_match = idx.by_sid.get(best_sid)
 
         if best_match and best_count >= 1:
-            sanc_words = self._normalize(best_match["name"]).split()
+            sanc_words = best_match.words
             # Потрібно хоча б прізвище: перше слово має збігатися
             if not sanc_words or name_words[0] != sanc_words[0]:
                 return SanctionMatch(found=False, match_type="none")
@@ -218,9 +315,9 @@ class SanctionsChecker:
                 return SanctionMatch(
                     found=True,
                     match_type="partial",
-                    matched_name=best_match["name"],
-                    sid=best_match["sid"],
-                    status=best_match["status"],
+                    matched_name=best_match.name,
+                    sid=best_match.sid,
+                    status=best_match.status,
                     confidence=min(confidence, 0.9)
                 )
 
@@ -228,15 +325,25 @@ class SanctionsChecker:
 
     def get_stats(self) -> dict:
         """Статистика санкційного списку"""
+        idx = self._index
         return {
             "loaded": self._loaded,
-            "total_names": len(self._names),
-            "unique_parts": len(self._name_parts),
+            "total_names": len(idx.names),
+            "unique_parts": len(idx.name_parts),
             "file": str(SANCTIONS_FILE)
         }
 
 
-# Global instance
+# Singleton instance
+_sanctions_checker: Optional[SanctionsChecker] = None
+_sanctions_checker_lock = threading.Lock()
+
+
 def get_sanctions_checker() -> SanctionsChecker:
-    """Get singleton sanctions checker instance"""
-    return SanctionsChecker()
+    """Get singleton sanctions checker instance (created and loaded once)"""
+    global _sanctions_checker
+    if _sanctions_checker is None:
+        with _sanctions_checker_lock:
+            if _sanctions_checker is None:
+                _sanctions_checker = SanctionsChecker()
+    return _sanctions_checker
@@ -1,8 +1,12 @@
 """Оновлення санкційного списку — при старті та щодня о 3:00"""
 
+import io
+import os
 import csv
+import shutil
 import logging
 import re
+import string
 from pathlib import Path
 from typing import Optional
 
@@ -14,6 +18,16 @@ OUTPUT_FILE = PROJECT_ROOT / "app" / "data" / "sanctions_individuals.csv"
 OPENSANCTIONS_URL = "https://data.opensanctions.org/datasets/latest/ua_nsdc_sanctions/targets.simple.csv"
 DRS_EXPORT_URL = "https://drs.nsdc.gov.ua/export/subjects"
 
+# Колонки OUTPUT_FILE; рядки — кортежі в цьому порядку
+FIELDNAMES = ("sid", "name", "translit_name", "aliases", "status")
+
+# Скомпільовані один раз, а не на кожен рядок CSV
+_ALIAS_SPLIT_RE = re.compile(r";(?=(?:[^\"]*\"[^\"]*\")*[^\"]*$)")  # ";" поза лапками
+
+# Набори символів для _extract_translit: isdisjoint замість regex-пошуку
+_LATIN = frozenset(string.ascii_letters)
+_CYRILLIC = frozenset("абвгдежзийклмнопрстуфхцчшщъыьэюяіїєґ" "АБВГДЕЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯІЇЄҐ")
+
 
 def _parse_status(sanctions_str: str) -> str:
     if not sanctions_str:
@@ -31,7 +45,8 @@ def _extract_translit(aliases: str) -> str:
         return ""
     for part in aliases.split(";"):
         part = part.strip().strip('"')
-        if part and re.search(r"[a-zA-Z]", part) and not re.search(r"[а-яіїєґ]", part.lower()):
+        # isascii() — O(1) прапорець рядка: ASCII-частина точно без кирилиці
+        if part and (part.isascii() or _CYRILLIC.isdisjoint(part)) and not _LATIN.isdisjoint(part):
             return part
     return ""
 
@@ -41,8 +56,15 @@ def _fetch_opensanctions() -> list:
     logger.info("Завантаження санкцій з OpenSanctions...")
     req = urllib.request.Request(OPENSANCTIONS_URL, headers={"User-Agent": "UkrainianNameDetector/1.0"})
     with urllib.request.urlopen(req, timeout=120) as resp:
-        text = resp.read().decode("utf-8")
-    reader = csv.DictReader(text.splitlines(), quotechar='"', skipinitialspace=True)
+        # Парсимо потік по рядку, не тримаючи весь CSV (десятки МБ) у пам'яті
+        stream = io.TextIOWrapper(resp, encoding="utf-8", newline="")
+        reader = csv.DictReader(stream, quotechar='"', skipinitialspace=True)
+        rows = _parse_opensanctions(reader)
+    logger.info(f"Завантажено {len(rows)} фізичних осіб")
+    return rows
+
+
+def _parse_opensanctions(reader: csv.DictReader) -> list:
     rows = []
     for row in reader:
         if row.get("schema") != "Person":
@@ -53,20 +75,13 @@ def _fetch_opensanctions() -> list:
         aliases_raw = row.get("aliases") or ""
         aliases_clean = [
             a.strip().strip('"').strip()
-            for a in re.split(r";(?=(?:[^\"]*\"[^\"]*\")*[^\"]*$)", aliases_raw)
+            for a in _ALIAS_SPLIT_RE.split(aliases_raw)
             if a.strip().strip('"') and a.strip().strip('"') != name
         ]
         aliases = "; ".join(aliases_clean[:5])
         status = _parse_status(row.get("sanctions") or "")
         translit = _extract_translit(aliases_raw)
-        rows.append({
-            "sid": row.get("id", ""),
-            "name": name,
-            "translit_name": translit,
-            "aliases": aliases,
-            "status": status,
-        })
-    logger.info(f"Завантажено {len(rows)} фізичних осіб")
+        rows.append((row.get("id", ""), name, translit, aliases, status))
     return rows
 
 
@@ -75,21 +90,24 @@ def _fetch_drs_direct() -> Optional[list]:
         import urllib.request
         req = urllib.request.Request(DRS_EXPORT_URL, headers={"User-Agent": "Mozilla/5.0 (compatible; UkrainianNameDetector/1.0)"})
         with urllib.request.urlopen(req, timeout=60) as resp:
-            text = resp.read().decode("utf-8")
-        if "Just a moment" in text or "cloudflare" in text.lower():
-            return None
-        reader = csv.DictReader(text.splitlines(), delimiter="\t")
-        rows = [
-            {
-                "sid": r.get("sid", ""),
-                "name": (r.get("name") or "").strip(),
-                "translit_name": r.get("translit_name", ""),
-                "aliases": r.get("aliases", ""),
-                "status": r.get("status", "active"),
-            }
-            for r in reader
-            if (r.get("name") or "").strip()
-        ]
+            # Cloudflare-заглушку видно з початку відповіді — дивимось лише перші ~4 КБ,
+            # далі парсимо той самий буферизований потік
+            buffered = io.BufferedReader(resp, buffer_size=1 << 16)
+            head = buffered.peek(4096)[:4096].decode("utf-8", errors="ignore")
+            if "Just a moment" in head or "cloudflare" in head.lower():
+                return None
+            reader = csv.DictReader(io.TextIOWrapper(buffered, encoding="utf-8", newline=""), delimiter="\t")
+            rows = [
+                (
+                    r.get("sid", ""),
+                    name,
+                    r.get("translit_name", ""),
+                    r.get("aliases", ""),
+                    r.get("status", "active"),
+                )
+                for r in reader
+                if (name := (r.get("name") or "").strip())
+            ]
         if rows:
             logger.info(f"Завантажено {len(rows)} записів з DRS")
             return rows
@@ -108,14 +126,19 @@ def run_update() -> bool:
         return False
 
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    if OUTPUT_FILE.exists():
-        OUTPUT_FILE.rename(OUTPUT_FILE.with_suffix(".csv.backup"))
 
-    fieldnames = ["sid", "name", "translit_name", "aliases", "status"]
-    with open(OUTPUT_FILE, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter="\t", extrasaction="ignore")
-        writer.writeheader()
+    # Пишемо в тимчасовий файл і атомарно підміняємо: reload() ніколи не бачить
+    # відсутній чи недописаний файл
+    tmp_file = OUTPUT_FILE.with_suffix(".csv.tmp")
+    with open(tmp_file, "w", buffering=1 << 20, encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(FIELDNAMES)
         writer.writerows(rows)
 
+    if OUTPUT_FILE.exists():
+        # Бекап копією — живий файл лишається на місці до os.replace
+        shutil.copy2(OUTPUT_FILE, OUTPUT_FILE.with_suffix(".csv.backup"))
+    os.replace(tmp_file, OUTPUT_FILE)
+
     logger.info(f"Санкції оновлено: {OUTPUT_FILE} ({len(rows)} записів)")
     return True
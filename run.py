@@ -10,6 +10,7 @@ Usage:
     python run.py              # Run with auto-setup
     python run.py --setup-only # Only run setup, don't start server
     python run.py --skip-setup # Skip setup, just start server
+    python run.py --force      # Re-run setup, re-create model files in models/ (HF cache is kept)
 """
 
 import argparse
@@ -29,6 +30,7 @@ Examples:
     python run.py                  # Auto-setup and run
     python run.py --setup-only     # Only download models
     python run.py --skip-setup     # Skip setup, run directly
+    python run.py --setup-only --force  # Re-link models from the HF cache
     python run.py --port 8080      # Run on custom port
         """
     )
@@ -42,6 +44,11 @@ Examples:
         action="store_true",
         help="Skip automatic setup"
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-run setup even if cached and re-create model files in models/ (HF cache is kept)"
+    )
     parser.add_argument(
         "--host",
         type=str,
@@ -75,17 +82,24 @@ Examples:
         print("=" * 60)
 
         from app.setup import SetupManager
-        setup = SetupManager()
-        setup.setup_all()
-        status = setup.verify_setup()
-
-        print("\n" + "=" * 40)
-        print("Setup Status:")
-        print("=" * 40)
-        for component, ok in status.items():
-            emoji = "[OK]" if ok else "[MISSING]"
-            print(f"  {emoji} {component}")
-        print("=" * 40)
+        setup = SetupManager(force=args.force)
+        if not args.force and setup.is_setup_cached():
+            # Нічого не змінилось з останнього успішного setup — пропускаємо перевірки
+            print("Setup cache hit, skipping checks (use --force to re-run setup)")
+        else:
+            setup.setup_all()
+            status = setup.verify_setup()
+            if all(status.values()):
+                setup.mark_setup_ok()
+
+            print("\n" + "=" * 40)
+            print("Setup Status:")
+            print("=" * 40)
+            for component, ok in status.items():
+                emoji = "[OK]" if ok else "[MISSING]"
+                print(f"  {emoji} {component}")
+            print("=" * 40)
+        setup.close()
 
         if args.setup_only:
             print("\nSetup complete. Run without --setup-only to start the server.")
@@ -9,6 +9,8 @@
 import os
 import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 
 # Додаємо корінь проекту в path
@@ -18,23 +20,52 @@ sys.path.insert(0, str(PROJECT_ROOT))
 MODELS_DIR = PROJECT_ROOT / "models"
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
 
+# HF cache для transformers. huggingface_hub читає HF_HOME при імпорті, а
+# завантаження йдуть паралельно — тому задаємо до старту потоків
+HF_CACHE_DIR = MODELS_DIR / "hf_cache"
+HF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+os.environ["HF_HOME"] = str(HF_CACHE_DIR)
 
+# hf_transfer — паралельне завантаження частинами (Rust); вмикаємо до імпорту
+# huggingface_hub і лише якщо пакет встановлено, інакше hub падає з помилкою
+try:
+    import hf_transfer  # noqa: F401
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+except ImportError:
+    pass
+
+
+def hf_download(**kwargs):
+    """hf_hub_download; при збої hf_transfer — повтор звичайним HTTPS"""
+    from huggingface_hub import constants, hf_hub_download
+
+    try:
+        return hf_hub_download(**kwargs)
+    except Exception as e:
+        if not constants.HF_HUB_ENABLE_HF_TRANSFER:
+            raise
+        print(f"  hf_transfer не спрацював ({e}) — повтор без нього")
+        os.environ["HF_HUB_ENABLE_HF_TRANSFER"] = "0"
+        constants.HF_HUB_ENABLE_HF_TRANSFER = False
+        return hf_hub_download(**kwargs)
+
+
+@lru_cache(maxsize=1)
 def get_hf_token():
-    """Отримати HF token з env або .env"""
+    """Отримати HF token з env або .env (один раз — далі з кешу)"""
     token = os.environ.get("HF_TOKEN") or os.environ.get("HUGGING_FACE_HUB_TOKEN")
-    if not token and (PROJECT_ROOT / ".env").exists():
+    if token:
+        return token
+    if (PROJECT_ROOT / ".env").exists():
         with open(PROJECT_ROOT / ".env") as f:
             for line in f:
                 if line.strip().startswith("HF_TOKEN="):
-                    token = line.split("=", 1)[1].strip().strip('"\'')
-                    break
-    return token or None
+                    return line.split("=", 1)[1].strip().strip('"\'') or None
+    return None
 
 
 def download_llm_gguf():
     """MamayLM GGUF (~2.5GB) — в models/ для llama.cpp"""
-    from huggingface_hub import hf_hub_download
-
     filename = "MamayLM-Gemma-3-4B-IT-v1.0.Q4_K_M.gguf"
     dest = MODELS_DIR / filename
     if dest.exists() and dest.stat().st_size > 1_000_000_000:
@@ -45,10 +76,11 @@ def download_llm_gguf():
     token = get_hf_token()
 
     def _do_download(tok):
-        return hf_hub_download(
+        return hf_download(
             repo_id="INSAIT-Institute/MamayLM-Gemma-3-4B-IT-v1.0-GGUF",
             filename=filename,
             token=tok,
+            resume_download=True,
         )
 
     try:
@@ -60,10 +92,16 @@ def download_llm_gguf():
         else:
             raise
 
-    src = Path(path)
+    src = Path(path).resolve()
     if src.exists():
-        shutil.copy2(src, dest)
-        print(f"Скопійовано в {dest}")
+        # Hardlink на blob у HF cache (без другої копії 2.5GB); між ФС — копія
+        dest.unlink(missing_ok=True)
+        try:
+            os.link(src, dest)
+            print(f"Зв'язано (hardlink) з {dest}")
+        except OSError:
+            shutil.copy2(src, dest)
+            print(f"Скопійовано в {dest}")
     else:
         raise FileNotFoundError(f"Завантаження не вдалось: {path}")
     print(f"[OK] LLM: {dest}")
@@ -71,11 +109,7 @@ def download_llm_gguf():
 
 
 def download_roberta_ner():
-    """RoBERTa NER — в HF cache для transformers"""
-    cache_dir = MODELS_DIR / "hf_cache"
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    os.environ["HF_HOME"] = str(cache_dir)
-
+    """RoBERTa NER — в HF cache для transformers (HF_CACHE_DIR)"""
     from transformers import AutoTokenizer, AutoModelForTokenClassification
 
     model_name = "EvanD/xlm-roberta-base-ukrainian-ner-ukrner"
@@ -105,23 +139,33 @@ def download_spacy():
         return True
     try:
         import spacy
-        spacy.load("uk_core_news_md")
-        print("[OK] spaCy uk_core_news_md вже є")
-        return True
-    except OSError:
-        pass
+        if spacy.util.is_package("uk_core_news_md"):
+            print("[OK] spaCy uk_core_news_md вже є")
+            return True
+    except ImportError:
+        spacy = None
     print("Встановлення spaCy uk_core_news_md...")
     import subprocess
-    subprocess.run(
-        [sys.executable, "-m", "pip", "install", "spacy>=3.8,<3.9"],
-        check=True,
-        capture_output=True,
-    )
-    subprocess.run(
-        [sys.executable, "-m", "spacy", "download", "uk_core_news_md"],
-        check=True,
-        capture_output=True,
-    )
+    # Модель потребує spaCy 3.8; якщо потрібне оновлення — все через pip у підпроцесі
+    if spacy is None or not spacy.__version__.startswith("3.8."):
+        subprocess.run(
+            [sys.executable, "-m", "pip", "install", "spacy>=3.8,<3.9"],
+            check=True,
+            capture_output=True,
+        )
+        subprocess.run(
+            [sys.executable, "-m", "spacy", "download", "uk_core_news_md"],
+            check=True,
+            capture_output=True,
+        )
+    else:
+        # Потрібний spaCy вже імпортований — завантажуємо в цьому ж процесі
+        from spacy.cli.download import download as spacy_download
+        try:
+            spacy_download("uk_core_news_md", False, False, "--quiet")
+        except SystemExit as e:
+            if e.code:
+                raise RuntimeError(f"spacy download завершився з кодом {e.code}")
     print("[OK] spaCy uk_core_news_md")
     return True
 
@@ -136,11 +180,26 @@ def main():
     else:
         print("HF_TOKEN не задано — публічні моделі завантажаться без нього")
 
-    download_spacy()
-    download_roberta_ner()
-    download_llm_gguf()
+    # Три незалежні джерела (PyPI, HF hub, HF CDN) — качаємо одночасно;
+    # збій одного завантаження не скасовує інші
+    failed = []
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = {
+            executor.submit(fn): fn.__name__
+            for fn in (download_spacy, download_roberta_ner, download_llm_gguf)
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"[FAIL] {futures[future]}: {e}")
+                failed.append(futures[future])
 
     print("=" * 50)
+    if failed:
+        print("Не завантажено:", ", ".join(failed))
+        print("=" * 50)
+        sys.exit(1)
     print("Готово. Моделі в:", MODELS_DIR)
     print("=" * 50)
 
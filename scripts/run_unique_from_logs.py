@@ -11,22 +11,32 @@
 import csv
 import json
 import sys
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import httpx
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 PROJECT_ROOT = Path(__file__).parent.parent
 LOGS_DIR = PROJECT_ROOT / "logs"
 REQUESTS_CSV = LOGS_DIR / "requests.csv"
 REQUESTS_BACKUP = LOGS_DIR / "requests.backup.csv"
 
+# Кількість одночасних запитів до API
+WORKERS = 8
+
 
 def get_log_path() -> Path:
     """Обрати файл логів (основний або backup)"""
     if REQUESTS_CSV.exists():
         with open(REQUESTS_CSV, "r", encoding="utf-8") as f:
             header = f.readline().strip().split(",")
-            row_count = sum(1 for _ in f)
-        if "original_comment" in header and row_count > 0:
+            has_rows = bool(f.readline())  # достатньо одного рядка, без підрахунку всіх
+        if "original_comment" in header and has_rows:
             return REQUESTS_CSV
     if REQUESTS_BACKUP.exists():
         return REQUESTS_BACKUP
@@ -35,27 +45,24 @@ def get_log_path() -> Path:
 
 def extract_unique_comments(log_path: Path) -> list[str]:
     """Витягти унікальні original_comment з CSV"""
-    comments = set()
-    with open(log_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            c = row.get("original_comment", "").strip()
-            if c:
-                comments.add(c)
+    with open(log_path, "r", encoding="utf-8", newline="") as f:
+        # csv.reader + індекс колонки: без dict на кожен рядок
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if "original_comment" not in header:
+            return []
+        idx = header.index("original_comment")
+        comments = {
+            c for c in (row[idx].strip() for row in reader if idx < len(row)) if c
+        }
     return sorted(comments)
 
 
-def call_api(comment: str, base_url: str) -> dict:
+def call_api(client: httpx.Client, comment: str) -> dict:
     """POST до /detect-name"""
-    data = json.dumps({"comment": comment}).encode("utf-8")
-    req = urllib.request.Request(
-        f"{base_url.rstrip('/')}/detect-name",
-        data=data,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
-    with urllib.request.urlopen(req, timeout=30) as resp:
-        return json.loads(resp.read().decode())
+    resp = client.post("/detect-name", json={"comment": comment})
+    resp.raise_for_status()
+    return resp.json()
 
 
 def main():
@@ -72,31 +79,50 @@ def main():
     print(f"Проганяємо через API {base_url}...\n")
     print("-" * 100)
 
-    results = []
-    for i, comment in enumerate(comments, 1):
+    def safe_call(comment: str):
         try:
-            r = call_api(comment, base_url)
-            tier = r.get("tier_detail") or r.get("tier_used", "?")
-            ms = r.get("processing_time_ms", "")
-            has_name = r.get("has_name", False)
-            detected = r.get("detected_name") or "-"
-            sanc = r.get("sanctions_check", {})
-            sanc_found = sanc.get("found", False)
-
-            line = f"{i:3}. [{tier:4}] {ms:>6}ms | has_name={has_name} | {detected[:40]:40} | sanc={sanc_found} | {comment[:45]}"
-            print(line)
-            results.append({"comment": comment, "response": r})
+            return call_api(client, comment), None
         except Exception as e:
-            print(f"{i:3}. ERROR: {comment[:50]}... -> {e}")
-            results.append({"comment": comment, "error": str(e)})
+            return None, e
+
+    results = []
+    # Один клієнт з пулом keep-alive з'єднань; запити йдуть паралельно,
+    # а executor.map віддає відповіді в порядку коментарів
+    with httpx.Client(
+        base_url=base_url.rstrip("/"),
+        timeout=30,
+        limits=httpx.Limits(max_connections=WORKERS * 2, max_keepalive_connections=WORKERS),
+    ) as client, ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        responses = executor.map(safe_call, comments)
+        for i, (comment, (r, error)) in enumerate(zip(comments, responses), 1):
+            try:
+                if error is not None:
+                    raise error
+                tier = r.get("tier_detail") or r.get("tier_used", "?")
+                ms = r.get("processing_time_ms", "")
+                has_name = r.get("has_name", False)
+                detected = r.get("detected_name") or "-"
+                sanc = r.get("sanctions_check", {})
+                sanc_found = sanc.get("found", False)
+
+                line = f"{i:3}. [{tier:4}] {ms:>6}ms | has_name={has_name} | {detected[:40]:40} | sanc={sanc_found} | {comment[:45]}"
+                print(line)
+                results.append({"comment": comment, "response": r})
+            except Exception as e:
+                print(f"{i:3}. ERROR: {comment[:50]}... -> {e}")
+                results.append({"comment": comment, "error": str(e)})
 
     print("-" * 100)
     print(f"\nОброблено: {len(results)}")
 
     # Зберегти результати в JSON для аналізу
     out_path = LOGS_DIR / "unique_run_results.json"
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        # orjson пише UTF-8 без екранування, як json з ensure_ascii=False
+        out_path.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    else:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
     print(f"Результати збережено: {out_path}")
 
 
@@ -5,89 +5,83 @@
 """
 
 import sys
-import json
-import urllib.request
+import asyncio
+from pathlib import Path
 
-BASE_URL = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8001"
+import aiohttp
+import orjson
+
+# Додаємо корінь проекту в path (схема відповіді API)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.schemas import NameDetectionResponse
 
+BASE_URL = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8001"
 
-def test_comment(comment: str, expect_has_name: bool) -> bool:
-    """Відправити коментар і перевірити результат."""
+# (розділ, коментар, очікуване has_name)
+CASES = [
+    ("Коментарі БЕЗ ПІБ", "Заробітна плата-за II половину листопада 2025 р.", False),
+    ("Коментарі БЕЗ ПІБ", "Заробітна плата-Зарплата за 1 половину листопада 2025р", False),
+    ("Коментарі БЕЗ ПІБ", "Переказ коштiв-Матеріальна допомога грошова проф виплата", False),
+    ("Коментарі БЕЗ ПІБ", "Заробітна плата-Слава Україні", False),
+    ("Коментарі БЕЗ ПІБ", "Премія-з Новим Роком", False),
+    ("Коментарі З ПІБ", "Заробітна плата-Булатов Руслан Олександрович", True),
+    ("Коментарі З ПІБ", "Заробітна плата-Іванов Петро Олександрович", True),
+    ("Санкції: в списку (Булатов Руслан Рустемович, Журавльов)", "Заробітна плата-Булатов Руслан Рустемович", True),
+    ("Санкції: в списку (Булатов Руслан Рустемович, Журавльов)", "Переказ-Журавльов Олексій Олександрович", True),
+    ("Санкції: НЕ в списку", "Заробітна плата-Іванов Петро Олександрович", True),
+    ("Санкції: НЕ в списку", "Премія-Мельник Олександр Олександрович", True),
+]
+
+
+async def test_comment(session: aiohttp.ClientSession, comment: str, expect_has_name: bool) -> tuple[bool, str]:
+    """Відправити коментар і перевірити результат; повертає (ok, рядок для виводу)."""
     try:
-        data = json.dumps({"comment": comment}).encode("utf-8")
-        req = urllib.request.Request(
-            f"{BASE_URL}/detect-name",
-            data=data,
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            result = json.loads(resp.read().decode())
+        # orjson одразу дає UTF-8 bytes (без json.dumps + encode)
+        body = orjson.dumps({"comment": comment})
+        async with session.post(f"{BASE_URL}/detect-name", data=body) as resp:
+            resp.raise_for_status()
+            # Парсинг і валідація одним викликом pydantic-core (заодно перевіряє схему відповіді)
+            result = NameDetectionResponse.model_validate_json(await resp.read())
     except Exception as e:
-        print(f"✗ Помилка: {e}")
-        return False
+        return False, f"✗ Помилка: {e}"
 
-    has_name = result.get("has_name", False)
-    detected = result.get("detected_name") or "-"
-    sanctions = result.get("sanctions_check", {})
-    sanctions_found = sanctions.get("found", False) if sanctions else False
+    detected = result.detected_name or "-"
+    sanctions_found = result.sanctions_check is not None and result.sanctions_check.found
 
-    ok = has_name == expect_has_name
+    ok = result.has_name == expect_has_name
     status = "✓" if ok else f"✗ очікувалось has_name={expect_has_name}"
     sanc_str = "САНКЦІЇ!" if sanctions_found else "ok"
-    preview = (comment[:47] + "...") if len(comment) > 50 else comment
-    print(f"  {status} | {detected} | {sanc_str} | {preview}")
-    return ok
+    preview = comment if len(comment) <= 50 else f"{comment[:47]}…"
+    return ok, f"  {status} | {detected} | {sanc_str} | {preview}"
 
 
-def main():
+async def main():
     print(f"=== Тестування API на {BASE_URL} ===\n")
 
-    passed = 0
-    total = 0
-
-    print("--- Коментарі БЕЗ ПІБ ---")
-    for comment in [
-        "Заробітна плата-за II половину листопада 2025 р.",
-        "Заробітна плата-Зарплата за 1 половину листопада 2025р",
-        "Переказ коштiв-Матеріальна допомога грошова проф виплата",
-        "Заробітна плата-Слава Україні",
-        "Премія-з Новим Роком",
-    ]:
-        total += 1
-        if test_comment(comment, False):
-            passed += 1
-
-    print("\n--- Коментарі З ПІБ ---")
-    for comment in [
-        "Заробітна плата-Булатов Руслан Олександрович",
-        "Заробітна плата-Іванов Петро Олександрович",
-    ]:
-        total += 1
-        if test_comment(comment, True):
-            passed += 1
-
-    print("\n--- Санкції: в списку (Булатов Руслан Рустемович, Журавльов) ---")
-    for comment in [
-        "Заробітна плата-Булатов Руслан Рустемович",
-        "Переказ-Журавльов Олексій Олександрович",
-    ]:
-        total += 1
-        if test_comment(comment, True):
-            passed += 1
-
-    print("\n--- Санкції: НЕ в списку ---")
-    for comment in [
-        "Заробітна плата-Іванов Петро Олександрович",
-        "Премія-Мельник Олександр Олександрович",
-    ]:
-        total += 1
-        if test_comment(comment, True):
-            passed += 1
+    # Усі запити одночасно через один пул keep-alive з'єднань; вивід — у порядку CASES
+    connector = aiohttp.TCPConnector(limit=16, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=10)
+    headers = {"Content-Type": "application/json"}
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        results = await asyncio.gather(
+            *(test_comment(session, comment, expect) for _, comment, expect in CASES)
+        )
 
+    section = None
+    for (case_section, _, _), (_, line) in zip(CASES, results):
+        if case_section != section:
+            if section is not None:
+                print()
+            print(f"--- {case_section} ---")
+            section = case_section
+        print(line)
+
+    passed = sum(ok for ok, _ in results)
+    total = len(results)
     print(f"\n=== Результат: {passed}/{total} тестів пройдено ===")
     sys.exit(0 if passed == total else 1)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
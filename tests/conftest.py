@@ -0,0 +1,62 @@
+"""Shared pytest fixtures"""
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--runslow", action="store_true", default=False,
+        help="run slow integration tests that load the NER/LLM models"
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: integration test that needs the full pipeline (--runslow)")
+
+
+def pytest_collection_modifyitems(config, items):
+    # За замовчуванням — лише швидкі unit-тести, без завантаження моделей
+    if config.getoption("--runslow"):
+        return
+    skip_slow = pytest.mark.skip(reason="need --runslow option to run")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def request_log_dir(tmp_path_factory):
+    """
+    Лог запитів — у тимчасову директорію, а не в logs/ репозиторію.
+
+    RequestLogger читає шляхи при створенні singleton-а, тож підміняємо їх
+    до першого get_request_logger() (pipeline створюється пізніше).
+    """
+    from app.services import request_logger
+
+    log_dir = tmp_path_factory.mktemp("logs")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(request_logger, "LOGS_DIR", log_dir)
+        mp.setattr(request_logger, "REQUEST_LOG_FILE", log_dir / "requests.csv")
+        mp.setattr(request_logger, "REQUEST_LOG_NDJSON_FILE", log_dir / "requests.ndjson")
+        mp.setattr(request_logger.RequestLogger, "_instance", None)
+        yield log_dir
+
+
+@pytest.fixture(scope="session")
+def pipeline():
+    """
+    Pipeline з повною ініціалізацією — один на всю сесію тестів.
+
+    get_pipeline() — singleton, тож моделі (spaCy, RoBERTa, LLM) завантажуються
+    один раз, а не в кожному модулі/класі. test_pipeline.py перекриває цю
+    фікстуру власною, без завантаження моделей. З pytest-xdist (-n N) кожен
+    воркер — окрема сесія зі своїм pipeline.
+    """
+    from app.services.pipeline import get_pipeline
+    p = get_pipeline()
+    # Прогрів: перший прохід моделей (ліниві ядра, фонове завантаження NER)
+    # оплачується тут, а не в першому тесті. Коментаря немає серед тестових —
+    # кеш результатів тестів не зачіпається
+    p.process_sync("Переказ коштів-Коваленко Олена Миколаївна")
+    return p
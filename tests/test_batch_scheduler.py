@@ -0,0 +1,101 @@
+"""Tests for async micro-batching (BatchScheduler)"""
+
+import asyncio
+
+import pytest
+
+from app.services.batch_scheduler import BatchScheduler
+
+
+class RecordingBatch:
+    """run_batch stub: records every batch and upper-cases the items"""
+
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        return [item.upper() for item in items]
+
+
+@pytest.mark.asyncio
+class TestBatchScheduler:
+    """Test batching, flushing and failure handling"""
+
+    async def test_full_batch_dispatched_once(self):
+        run_batch = RecordingBatch()
+        scheduler = BatchScheduler(run_batch, max_batch=3, timeout_ms=10_000)
+
+        results = await asyncio.gather(*(scheduler.submit(c) for c in ("a", "b", "c")))
+
+        assert results == ["A", "B", "C"]
+        assert run_batch.batches == [["a", "b", "c"]]
+        scheduler.close()
+
+    async def test_partial_batch_flushed_on_timeout(self):
+        run_batch = RecordingBatch()
+        scheduler = BatchScheduler(run_batch, max_batch=10, timeout_ms=20)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(scheduler.submit("a"), scheduler.submit("b")), timeout=2
+        )
+
+        assert results == ["A", "B"]
+        assert run_batch.batches == [["a", "b"]]
+        scheduler.close()
+
+    async def test_batch_error_fails_every_item(self):
+        async def run_batch(items):
+            raise ValueError("boom")
+
+        scheduler = BatchScheduler(run_batch, max_batch=2, timeout_ms=10_000)
+        results = await asyncio.gather(
+            scheduler.submit("a"), scheduler.submit("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, ValueError) for r in results)
+        scheduler.close()
+
+    async def test_result_count_mismatch_fails_every_item(self):
+        async def run_batch(items):
+            return ["only one"]
+
+        scheduler = BatchScheduler(run_batch, max_batch=3, timeout_ms=10_000)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(scheduler.submit(c) for c in ("a", "b", "c")), return_exceptions=True),
+            timeout=2
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        scheduler.close()
+
+    async def test_close_fails_queued_items(self):
+        run_batch = RecordingBatch()
+        scheduler = BatchScheduler(run_batch, max_batch=10, timeout_ms=10_000)
+
+        tasks = [asyncio.create_task(scheduler.submit(c)) for c in ("a", "b", "c")]
+        await asyncio.sleep(0)  # елементи в черзі, flusher ще не стартував
+        scheduler.close()
+
+        results = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=2)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert run_batch.batches == []
+
+    async def test_close_fails_batch_being_collected(self):
+        run_batch = RecordingBatch()
+        scheduler = BatchScheduler(run_batch, max_batch=10, timeout_ms=10_000)
+
+        tasks = [asyncio.create_task(scheduler.submit(c)) for c in ("a", "b")]
+        await asyncio.sleep(0.01)  # flusher вже забрав елементи і чекає на решту батчу
+        scheduler.close()
+
+        results = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=2)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert run_batch.batches == []
+
+    async def test_submit_after_close_raises(self):
+        scheduler = BatchScheduler(RecordingBatch(), max_batch=2, timeout_ms=10)
+        scheduler.close()
+
+        with pytest.raises(RuntimeError):
+            await scheduler.submit("a")
@@ -0,0 +1,99 @@
+"""Tests for the sharded LRU result cache"""
+
+import pytest
+
+from app.services.cache import CACHE_SHARDS, CacheService, content_key
+from app.models.schemas import NameCategory, NameDetectionResponse
+
+
+RESPONSE = NameDetectionResponse(
+    has_name=False, category=NameCategory.NO_NAME,
+    detected_name=None, confidence=0.95, tier_used=1
+)
+
+
+@pytest.fixture
+def cache():
+    c = CacheService()
+    assert c.is_enabled
+    # Маленькі шарди, щоб витіснення було видно на кількох ключах
+    c._shard_maxsize = 2
+    return c
+
+
+class TestContentKey:
+    """Test cache key normalization"""
+
+    def test_case_and_whitespace_collapse(self):
+        assert content_key("Зарплата  за\tгрудень") == content_key("зарплата за грудень")
+
+    def test_different_text_different_key(self):
+        assert content_key("Зарплата за грудень") != content_key("Зарплата за листопад")
+
+
+class TestShardSelection:
+    """Test that keys are spread over shards by hash"""
+
+    def test_keys_land_in_expected_shard(self, cache):
+        for key in range(CACHE_SHARDS):
+            cache.set(key, RESPONSE)
+        # Малі int хешуються в себе, тож кожен ключ — у власному шарді
+        for i, shard in enumerate(cache._shards):
+            assert list(shard) == [i]
+
+    def test_same_shard_for_congruent_keys(self, cache):
+        assert cache._shard(3) is cache._shard(3 + CACHE_SHARDS)
+        assert cache._shard(3) is not cache._shard(4)
+
+
+class TestShardEviction:
+    """Test LRU eviction inside a single shard"""
+
+    def test_oldest_evicted_per_shard(self, cache):
+        cache.set(1, RESPONSE)  # інший шард — не витісняється
+        for key in (0, CACHE_SHARDS, 2 * CACHE_SHARDS):
+            cache.set(key, RESPONSE)
+
+        assert 0 not in cache
+        assert CACHE_SHARDS in cache
+        assert 2 * CACHE_SHARDS in cache
+        assert 1 in cache
+
+    def test_get_refreshes_lru_order(self, cache):
+        cache.set(0, RESPONSE)
+        cache.set(CACHE_SHARDS, RESPONSE)
+        assert cache.get(0) is RESPONSE
+        cache.set(2 * CACHE_SHARDS, RESPONSE)
+
+        assert 0 in cache
+        assert CACHE_SHARDS not in cache
+
+
+class TestCacheStatsAndClear:
+    """Test stats aggregated across shards and clear()"""
+
+    def test_stats_totals_across_shards(self, cache):
+        for key in range(CACHE_SHARDS + 3):
+            cache.set(key, RESPONSE)
+        cache.get(0)
+        cache.get(5)
+        cache.get(10_000)
+
+        stats = cache.get_stats()
+        assert stats["size"] == CACHE_SHARDS + 3
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == "66.7%"
+
+    def test_clear_empties_all_shards(self, cache):
+        for key in range(2 * CACHE_SHARDS):
+            cache.set(key, RESPONSE)
+        cache.get(0)
+        cache.clear()
+
+        assert all(len(shard) == 0 for shard in cache._shards)
+        stats = cache.get_stats()
+        assert stats["size"] == 0
+        assert stats["hits"] == 0
+        assert stats["misses"] == 0
+        assert cache.get(0) is None
@@ -5,20 +5,15 @@
 - Привітання та стоп-слова (Слава Україні, з Новим Роком)
 - Різні формати платіжних коментарів
 
-Запуск: pytest tests/test_comprehensive.py -v
+Запуск: pytest tests/test_comprehensive.py -v --runslow
 (Перший запуск завантажує моделі - може зайняти 1-2 хв)
 """
 
 import pytest
-from app.services.pipeline import get_pipeline
 from app.models.schemas import NameCategory, NameDetectionResponse
 
-
-@pytest.fixture(scope="module")
-def pipeline():
-    """Pipeline з повною ініціалізацією"""
-    p = get_pipeline()
-    return p
+# Фікстура pipeline (scope="session") — у tests/conftest.py; весь модуль — інтеграційний
+pytestmark = pytest.mark.slow
 
 
 # ========== Коментарі БЕЗ ПІБ (різні префікси) ==========
@@ -1,7 +1,7 @@
 """Tests for the full pipeline"""
 
 import pytest
-import json
+import orjson
 from pathlib import Path
 
 from app.services.pipeline import NameDetectionPipeline
@@ -16,12 +16,11 @@ def pipeline():
     return p
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def test_data():
-    """Load test data"""
+    """Load test data (once per session; tests only read it)"""
     test_file = Path(__file__).parent / "test_data" / "comments.json"
-    with open(test_file, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return orjson.loads(test_file.read_bytes())
 
 
 class TestPipelineNoNameDetection:
@@ -75,6 +74,7 @@ class TestPipelineStats:
         assert final_stats["total_requests"] == initial_total + 1
 
 
+@pytest.mark.slow
 class TestPipelineWithTestData:
     """Integration tests with test data file"""
 
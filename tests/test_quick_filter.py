@@ -1,8 +1,23 @@
 """Tests for Tier 1: Quick Filter"""
 
+import re
+
 import pytest
 from app.services.quick_filter import QuickFilter
 from app.models.schemas import NameCategory
+from app.data.patterns import (
+    NO_NAME_PATTERNS,
+    NO_NAME_PATTERNS_RAW,
+    NAME_INDICATOR_PATTERNS,
+    NAME_INDICATOR_PATTERNS_RAW,
+    normalize,
+    matches_no_name_pattern,
+    matches_name_indicator,
+    build_prefix_screen,
+    split_exact_literals,
+    _literal_prefixes,
+    _split_alternatives,
+)
 
 
 @pytest.fixture
@@ -98,3 +113,108 @@ class TestQuickFilterPassThrough:
         result = quick_filter.process(comment)
         # Should return None for uncertain cases
         assert result is None
+
+
+def _screened_match(pattern: str, text: str) -> bool:
+    """Match one raw pattern the way patterns.py does: exact set, then prefix prescreen"""
+    exact, rest = split_exact_literals([pattern])
+    if not rest:
+        return text in exact
+    if not pattern.startswith("^"):
+        return re.search(pattern, text, re.IGNORECASE) is not None
+    prefixes, unprefixed = build_prefix_screen(rest)
+    if not unprefixed and not text.startswith(prefixes):
+        return False
+    return re.match(pattern[1:], text, re.IGNORECASE) is not None
+
+
+def _pattern_corpus() -> list:
+    """Texts around every literal prefix / exact phrase plus hand-picked edge cases"""
+    texts = {
+        "", "зарплата", "зарплатня", "зп за грудень", "з/п", "заробітна плата.",
+        "за грудень 2024", "за 3 місяць", "за 12/2024", "за 12.2024", "за послуги",
+        "за товари іванову", "за роботу", "1000 грн", "500.50", "1 000,50", "50$", "100 €",
+        "100 uah", "12a", "рахунок №5", "рахунок#1", "рахунок-фактура 7", "рахунок",
+        "акт 12", "invoice 3", "переказ коштів", "переказ коштів іванову", "переказ",
+        "переказ іванову петру", "на карту бондаренко", "від коваленко", "для шевченко тараса",
+        "іванов петро сергійович", "іванов і.і.", "іванов і. і.", "слава україні",
+        "слава україні!", "з новим роком", "з 8 березня", "газ", "газета", "вода 5",
+        "єдиний внесок", "військовий збір.", "якийсь текст без паттернів",
+    }
+    for raw in NO_NAME_PATTERNS_RAW:
+        exact, rest = split_exact_literals([raw])
+        prefixes = set(exact)
+        for p in rest:
+            prefixes.update(_literal_prefixes(p[1:]) or ())
+        for prefix in prefixes:
+            texts.update({
+                prefix, prefix + " ", prefix + ".", prefix + "x", prefix + " 5",
+                prefix + "#1", prefix + "№2", prefix + "5", "x" + prefix, prefix[:-1],
+            })
+    return sorted(texts)
+
+
+PATTERN_CORPUS = _pattern_corpus()
+
+
+class TestPatternHelpers:
+    """Test the literal-prefix / exact-phrase decomposition of regex patterns"""
+
+    def test_split_alternatives_top_level_only(self):
+        assert _split_alternatives("а|б(в|г)|д") == ["а", "б(в|г)", "д"]
+
+    def test_split_alternatives_keeps_escaped_bar(self):
+        assert _split_alternatives(r"а\|б|в") == [r"а\|б", "в"]
+
+    def test_literal_prefixes_alternation_group(self):
+        assert _literal_prefixes(r"(?:зарплата|зп|з/п)(?:\s|$)") == ["зарплата", "зп", "з/п"]
+
+    def test_literal_prefixes_nested_group(self):
+        assert _literal_prefixes(r"(?:за (?:послуги|товари))\s") == ["за "]
+
+    def test_literal_prefixes_stops_at_escape(self):
+        assert _literal_prefixes(r"за\s+\d+") == ["за"]
+
+    @pytest.mark.parametrize("pattern", [r"\d+грн", r"[\d\s]+$", r"(?:а|\d)б", r"(?:а|[бв])"])
+    def test_literal_prefixes_none_for_non_literal_start(self, pattern):
+        assert _literal_prefixes(pattern) is None
+
+    def test_literal_prefixes_drops_quantified_char(self):
+        assert _literal_prefixes("абв?г") == ["аб"]
+        assert _literal_prefixes("аб*") == ["а"]
+
+    def test_build_prefix_screen_needs_anchor(self):
+        prefixes, unprefixed = build_prefix_screen([r"^акт\s", r"акт\s", r"^\d+$"])
+        assert prefixes == ("акт",)
+        assert unprefixed == [r"акт\s", r"^\d+$"]
+
+    def test_split_exact_literals(self):
+        exact, rest = split_exact_literals([
+            r"^(?:Переказ|перевод)$", r"^слава україні$", r"^\d+$",
+            r"^(?:а|б)в$", r"^акт(?:\s|$)", r"переказ",
+        ])
+        assert exact == {"переказ", "перевод", "слава україні"}
+        assert rest == [r"^\d+$", r"^(?:а|б)в$", r"^акт(?:\s|$)", r"переказ"]
+
+
+class TestPatternScreenAgreement:
+    """The prescreen/exact-literal path must agree with plain re for every pattern"""
+
+    @pytest.mark.parametrize("pattern", NO_NAME_PATTERNS_RAW)
+    def test_no_name_pattern_entry(self, pattern):
+        compiled = re.compile(pattern, re.IGNORECASE)
+        for text in PATTERN_CORPUS:
+            assert _screened_match(pattern, text) == (compiled.search(text) is not None), text
+
+    @pytest.mark.parametrize("pattern", NAME_INDICATOR_PATTERNS_RAW)
+    def test_name_indicator_entry(self, pattern):
+        compiled = re.compile(pattern, re.IGNORECASE)
+        for text in PATTERN_CORPUS:
+            assert _screened_match(pattern, text) == (compiled.search(text) is not None), text
+
+    @pytest.mark.parametrize("text", PATTERN_CORPUS + ["  Зарплата за грудень ", "ПЕРЕКАЗ КОШТІВ"])
+    def test_combined_matchers(self, text):
+        stripped = text.strip()
+        assert matches_no_name_pattern(text) == any(p.search(stripped) for p in NO_NAME_PATTERNS)
+        assert matches_name_indicator(text) == any(p.search(stripped) for p in NAME_INDICATOR_PATTERNS)
+        assert normalize(text) == stripped.lower()
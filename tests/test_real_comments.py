@@ -4,9 +4,12 @@
 Формат: "Призначення платежу-Кастомний коментар з ПІБ"
 """
 
+import os
 import pytest
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import NamedTuple, Optional
 
 # Додаємо корінь проекту до шляху
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -14,83 +17,84 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from app.models.schemas import NameCategory
 
 
+class Case(NamedTuple):
+    """Тестовий кейс: коментар і очікуваний результат (None — не перевіряємо)"""
+    comment: str
+    has_name: bool
+    category: Optional[NameCategory]
+    name: Optional[str]
+
+
 # Тестові кейси: (коментар, очікуваний has_name, очікувана категорія, очікуване ім'я)
-TEST_CASES = [
+TEST_CASES = (
     # === Заробітна плата ===
-    ("Заробітна плата-Іванов Петро Сергійович", True, NameCategory.FULL_NAME, "Іванов Петро Сергійович"),
-    ("Заробітна плата-Шевченко Марія", True, NameCategory.SURNAME_NAME, "Шевченко Марія"),
-    ("Заробітна плата-Бондаренко", True, NameCategory.SURNAME_ONLY, "Бондаренко"),
-    ("Заробітна плата-за січень 2025", False, NameCategory.NO_NAME, None),
-    ("Заробітна плата-за 2 пол жовтня 2025 року", False, NameCategory.NO_NAME, None),
-    ("Заробітна плата-", False, NameCategory.NO_NAME, None),
+    Case("Заробітна плата-Іванов Петро Сергійович", True, NameCategory.FULL_NAME, "Іванов Петро Сергійович"),
+    Case("Заробітна плата-Шевченко Марія", True, NameCategory.SURNAME_NAME, "Шевченко Марія"),
+    Case("Заробітна плата-Бондаренко", True, NameCategory.SURNAME_ONLY, "Бондаренко"),
+    Case("Заробітна плата-за січень 2025", False, NameCategory.NO_NAME, None),
+    Case("Заробітна плата-за 2 пол жовтня 2025 року", False, NameCategory.NO_NAME, None),
+    Case("Заробітна плата-", False, NameCategory.NO_NAME, None),
 
     # === Стипендія ===
-    ("Стипендія-Коваленко Андрій Васильович", True, NameCategory.FULL_NAME, "Коваленко Андрій Васильович"),
-    ("Стипендія-Петренко Олена", True, NameCategory.SURNAME_NAME, "Петренко Олена"),
-    ("Стипендія-за грудень", False, NameCategory.NO_NAME, None),
-    ("Стипендія-", False, NameCategory.NO_NAME, None),
+    Case("Стипендія-Коваленко Андрій Васильович", True, NameCategory.FULL_NAME, "Коваленко Андрій Васильович"),
+    Case("Стипендія-Петренко Олена", True, NameCategory.SURNAME_NAME, "Петренко Олена"),
+    Case("Стипендія-за грудень", False, NameCategory.NO_NAME, None),
+    Case("Стипендія-", False, NameCategory.NO_NAME, None),
 
     # === Аванс ===
-    ("Аванс-Мельник Ігор Петрович", True, NameCategory.FULL_NAME, "Мельник Ігор Петрович"),
-    ("Аванс-Кравченко Наталія", True, NameCategory.SURNAME_NAME, "Кравченко Наталія"),
-    ("Аванс-за лютий", False, NameCategory.NO_NAME, None),
-    ("Аванс-", False, NameCategory.NO_NAME, None),
+    Case("Аванс-Мельник Ігор Петрович", True, NameCategory.FULL_NAME, "Мельник Ігор Петрович"),
+    Case("Аванс-Кравченко Наталія", True, NameCategory.SURNAME_NAME, "Кравченко Наталія"),
+    Case("Аванс-за лютий", False, NameCategory.NO_NAME, None),
+    Case("Аванс-", False, NameCategory.NO_NAME, None),
 
     # === Премія ===
-    ("Премія-Савченко Олег Миколайович", True, NameCategory.FULL_NAME, "Савченко Олег Миколайович"),
-    ("Премія-Ткаченко Ірина", True, NameCategory.SURNAME_NAME, "Ткаченко Ірина"),
-    ("Премія-квартальна", False, NameCategory.NO_NAME, None),
-    ("Премія-", False, NameCategory.NO_NAME, None),
+    Case("Премія-Савченко Олег Миколайович", True, NameCategory.FULL_NAME, "Савченко Олег Миколайович"),
+    Case("Премія-Ткаченко Ірина", True, NameCategory.SURNAME_NAME, "Ткаченко Ірина"),
+    Case("Премія-квартальна", False, NameCategory.NO_NAME, None),
+    Case("Премія-", False, NameCategory.NO_NAME, None),
 
     # === Переказ ===
-    ("Переказ-Гончаренко Віктор Іванович", True, NameCategory.FULL_NAME, "Гончаренко Віктор Іванович"),
-    ("Переказ-Лисенко Тетяна", True, NameCategory.SURNAME_NAME, None),  # LLM може повернути різний порядок
-    ("Переказ-Сидоренко", True, NameCategory.SURNAME_ONLY, "Сидоренко"),
-    ("Переказ-на рахунок", False, NameCategory.NO_NAME, None),
+    Case("Переказ-Гончаренко Віктор Іванович", True, NameCategory.FULL_NAME, "Гончаренко Віктор Іванович"),
+    Case("Переказ-Лисенко Тетяна", True, NameCategory.SURNAME_NAME, None),  # LLM може повернути різний порядок
+    Case("Переказ-Сидоренко", True, NameCategory.SURNAME_ONLY, "Сидоренко"),
+    Case("Переказ-на рахунок", False, NameCategory.NO_NAME, None),
 
     # === Оплата ===
-    ("Оплата послуг-Марченко Дмитро Олексійович", True, NameCategory.FULL_NAME, "Марченко Дмитро Олексійович"),
-    ("Оплата товару-Федоренко Оксана", True, NameCategory.SURNAME_NAME, None),  # LLM може змінити порядок
-    ("Оплата-за комунальні послуги", False, NameCategory.NO_NAME, None),
+    Case("Оплата послуг-Марченко Дмитро Олексійович", True, NameCategory.FULL_NAME, "Марченко Дмитро Олексійович"),
+    Case("Оплата товару-Федоренко Оксана", True, NameCategory.SURNAME_NAME, None),  # LLM може змінити порядок
+    Case("Оплата-за комунальні послуги", False, NameCategory.NO_NAME, None),
 
     # === Поповнення ===
-    ("Поповнення рахунку-Романенко Юрій Степанович", True, NameCategory.FULL_NAME, "Романенко Юрій Степанович"),
-    ("Поповнення-Клименко Світлана", True, NameCategory.SURNAME_NAME, "Клименко Світлана"),
-    ("Поповнення-картки", False, NameCategory.NO_NAME, None),
+    Case("Поповнення рахунку-Романенко Юрій Степанович", True, NameCategory.FULL_NAME, "Романенко Юрій Степанович"),
+    Case("Поповнення-Клименко Світлана", True, NameCategory.SURNAME_NAME, "Клименко Світлана"),
+    Case("Поповнення-картки", False, NameCategory.NO_NAME, None),
 
     # === Виплата ===
-    ("Виплата-Левченко Анна Володимирівна", True, NameCategory.FULL_NAME, "Левченко Анна Володимирівна"),
-    ("Виплата-Павленко Максим", True, None, None),  # LLM може додати по батькові (галюцінація)
-    ("Виплата-соціальна допомога", False, NameCategory.NO_NAME, None),
+    Case("Виплата-Левченко Анна Володимирівна", True, NameCategory.FULL_NAME, "Левченко Анна Володимирівна"),
+    Case("Виплата-Павленко Максим", True, None, None),  # LLM може додати по батькові (галюцінація)
+    Case("Виплата-соціальна допомога", False, NameCategory.NO_NAME, None),
 
     # === Допомога ===
-    ("Матеріальна допомога-Зінченко Катерина Павлівна", True, NameCategory.FULL_NAME, "Зінченко Катерина Павлівна"),
-    ("Допомога-Яковенко Сергій", True, NameCategory.SURNAME_NAME, "Яковенко Сергій"),
-    ("Допомога-на лікування", False, NameCategory.NO_NAME, None),
+    Case("Матеріальна допомога-Зінченко Катерина Павлівна", True, NameCategory.FULL_NAME, "Зінченко Катерина Павлівна"),
+    Case("Допомога-Яковенко Сергій", True, NameCategory.SURNAME_NAME, "Яковенко Сергій"),
+    Case("Допомога-на лікування", False, NameCategory.NO_NAME, None),
 
     # === Складні випадки ===
-    ("Заробітна плата-Іваненко-Петренко Марія", True, NameCategory.SURNAME_NAME, None),  # Подвійне прізвище
-    ("Переказ-від Шевченка Івана", True, None, None),  # Родовий відмінок - складно
-    ("Оплата-Іван", True, NameCategory.NAME_ONLY, "Іван"),  # Тільки ім'я
+    Case("Заробітна плата-Іваненко-Петренко Марія", True, NameCategory.SURNAME_NAME, None),  # Подвійне прізвище
+    Case("Переказ-від Шевченка Івана", True, None, None),  # Родовий відмінок - складно
+    Case("Оплата-Іван", True, NameCategory.NAME_ONLY, "Іван"),  # Тільки ім'я
 
     # === Без тире (весь коментар) ===
-    ("Петренко Олег Васильович", True, NameCategory.FULL_NAME, "Петренко Олег Васильович"),
-    ("Шевченко Марія", True, NameCategory.SURNAME_NAME, "Шевченко Марія"),
-    ("зарплата за січень", False, NameCategory.NO_NAME, None),
-]
+    Case("Петренко Олег Васильович", True, NameCategory.FULL_NAME, "Петренко Олег Васильович"),
+    Case("Шевченко Марія", True, NameCategory.SURNAME_NAME, "Шевченко Марія"),
+    Case("зарплата за січень", False, NameCategory.NO_NAME, None),
+)
 
 
+@pytest.mark.slow
 class TestRealComments:
     """Тести з реальними платіжними коментарями"""
 
-    @pytest.fixture(scope="class")
-    def pipeline(self):
-        """Ініціалізуємо pipeline один раз для всіх тестів"""
-        from app.services.pipeline import NameDetectionPipeline
-        p = NameDetectionPipeline()
-        p.initialize()
-        return p
-
     @pytest.mark.parametrize("comment,expected_has_name,expected_category,expected_name", TEST_CASES)
     def test_comment(self, pipeline, comment, expected_has_name, expected_category, expected_name):
         """Тестуємо обробку коментаря"""
@@ -111,16 +115,10 @@ class TestRealComments:
                 f"Comment: '{comment}'\nExpected name='{expected_name}', got '{result.detected_name}'"
 
 
+@pytest.mark.slow
 class TestEdgeCases:
     """Тести граничних випадків"""
 
-    @pytest.fixture(scope="class")
-    def pipeline(self):
-        from app.services.pipeline import NameDetectionPipeline
-        p = NameDetectionPipeline()
-        p.initialize()
-        return p
-
     def test_empty_after_dash(self, pipeline):
         """Порожній коментар після тире"""
         result = pipeline.process_sync("Заробітна плата-")
@@ -169,9 +167,12 @@ def run_quick_test():
     passed = 0
     failed = 0
 
-    for comment, expected_has_name, expected_category, expected_name in TEST_CASES:
-        result = pipeline.process_sync(comment)
+    # Коментарі незалежні — обробляємо паралельно (інференс моделей відпускає GIL),
+    # а результати перевіряємо й друкуємо в порядку TEST_CASES
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+        results = list(executor.map(pipeline.process_sync, [case.comment for case in TEST_CASES]))
 
+    for (comment, expected_has_name, expected_category, expected_name), result in zip(TEST_CASES, results):
         # Перевіряємо
         ok = True
         errors = []
@@ -5,7 +5,7 @@ from app.services.sanctions_checker import get_sanctions_checker
 from app.models.schemas import NameCategory
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def sanctions():
     """Sanctions checker instance"""
     return get_sanctions_checker()